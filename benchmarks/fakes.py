@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+"""
+Stand-ins for the bot and the Discord objects it talks to, shared by the scripts in
+this directory. They only implement what the code under test actually uses.
+"""
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(embed if embed is not None else content)
+
+
+class FakeGuild:
+    name = "r/ChromeOS"
+
+    def __init__(self, ban_latency: float = 0):
+        """A guild whose bans take `ban_latency` seconds, like a request to Discord."""
+
+        self.ban_latency = ban_latency
+        self.members = {}
+        self.bans = 0
+        self.channel = FakeChannel()
+
+    def get_member(self, id):
+        return self.members.get(id)
+
+    def get_channel(self, id):
+        return self.channel
+
+    async def ban(self, user, reason=None):
+        await asyncio.sleep(self.ban_latency)
+        self.bans += 1
+        self.members.pop(user.id, None)
+
+
+class FakeMember:
+    def __init__(self, guild, id):
+        self.guild = guild
+        self.id = id
+        self.mention = f"<@{id}>"
+
+    def __str__(self):
+        return f"user#{self.id % 10000:04}"
+
+    async def ban(self, reason=None):
+        await self.guild.ban(self, reason=reason)
+
+
+class FakeBot:
+    owner_id = None
+
+    def __init__(self, settings=None):
+        self.loop = asyncio.get_event_loop()
+        self.user = FakeMember(None, 1)
+        self.settings = settings
+
+
+def make_settings(bot: FakeBot):
+    """A real Settings cog for `bot`, backed by mongomock unless CHROMEY_MONGO_HOST
+    points to a (throwaway!) mongod.
+    """
+
+    os.environ.setdefault("CHROMEY_MAINGUILD", "1")
+    os.environ.setdefault("CHROMEY_MONGO_HOST", "mongomock://localhost")
+    from cogs.utils.settings import Settings
+
+    bot.settings = Settings(bot)
+    return bot.settings
+
+
+async def close_settings(settings) -> None:
+    settings._flusher.cancel()
+    settings.db_executor.shutdown()
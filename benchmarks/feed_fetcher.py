@@ -0,0 +1,88 @@
+import asyncio
+
+from aiohttp import web
+from benchmarks.fakes import FakeBot
+from cogs.utils.feed_fetcher import FeedFetcher
+
+"""
+Check of the shared feed fetcher against a local HTTP stub serving canned RSS: the first
+poll parses the feed, a 304 or an unchanged body isn't parsed again, a changed feed is,
+and a failing feed gives None instead of an exception.
+
+Run from the repository root with `python -m benchmarks.feed_fetcher`
+"""
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Stub</title>
+{items}
+</channel></rss>"""
+ITEM = "<item><title>{0}</title><link>https://example.com/{0}</link><guid>https://example.com/{0}</guid></item>"
+
+
+class StubFeed:
+    def __init__(self):
+        self.entries = ["first"]
+        # send ETags and answer conditional requests with 304
+        self.conditional = True
+        self.fail = False
+        self.requests = []
+
+    def body(self) -> str:
+        return RSS.format(items="\n".join(ITEM.format(entry) for entry in self.entries))
+
+    async def handle(self, request):
+        self.requests.append(dict(request.headers))
+        if self.fail:
+            return web.Response(status=500)
+
+        etag = f'"{len(self.entries)}"'
+        if self.conditional and request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+
+        headers = {"ETag": etag} if self.conditional else {}
+        return web.Response(text=self.body(), content_type="application/rss+xml", headers=headers)
+
+
+async def check(port: int = 8799):
+    stub = StubFeed()
+    app = web.Application()
+    app.router.add_get("/feed", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    url = f"http://127.0.0.1:{port}/feed"
+
+    fetcher = FeedFetcher(FakeBot())
+    try:
+        data = await fetcher.fetch(url)
+        assert [entry.title for entry in data.entries] == ["first"]
+
+        # unchanged: the stub answers 304
+        assert await fetcher.fetch(url) is None
+        assert stub.requests[-1].get("If-None-Match") == '"1"'
+
+        # unchanged, without conditional request support: the body hash catches it
+        stub.conditional = False
+        assert await fetcher.fetch(url) is None
+
+        stub.entries.append("second")
+        data = await fetcher.fetch(url)
+        assert [entry.title for entry in data.entries] == ["first", "second"]
+
+        # errors are reported, not raised
+        stub.fail = True
+        assert await fetcher.fetch(url) is None
+        stub.fail = False
+
+        # forgetting the feed parses it again even though it didn't change
+        fetcher.reset(url)
+        assert await fetcher.fetch(url) is not None
+
+        print(f"feed fetcher OK ({len(stub.requests)} requests)")
+    finally:
+        await fetcher.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(check())
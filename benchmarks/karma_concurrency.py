@@ -0,0 +1,48 @@
+import asyncio
+import random
+import time
+
+from benchmarks.fakes import FakeBot, close_settings, make_settings
+from data.karmaevent import KarmaEvent
+from data.user import User
+
+"""
+Concurrency check: many karma gives to the same users at once must not lose any updates,
+in the database, the cached User documents or the karma index.
+
+Run from the repository root with `python -m benchmarks.karma_concurrency [gives] [users]`
+"""
+
+
+async def check(gives: int, receivers: int):
+    settings = make_settings(FakeBot())
+    ids = list(range(1000, 1000 + receivers))
+    # part of the users cached and in the index before the gives start, part not
+    for id in ids[::2]:
+        await settings.user(id)
+    await settings.karma_index()
+
+    amounts = [(random.choice(ids), random.choice([-3, -2, -1, 1, 2, 3])) for _ in range(gives)]
+    start = time.perf_counter()
+    await asyncio.gather(*[settings.add_karma(1, id, amount, "check") for id, amount in amounts])
+    elapsed = time.perf_counter() - start
+
+    index = dict(await settings.karma_index())
+    for id in ids:
+        expected = sum(amount for to_id, amount in amounts if to_id == id)
+        stored = User._get_collection().find_one({"_id": id})["karma"]
+        cached = (await settings.user(id)).karma
+        events = KarmaEvent._get_collection().count_documents({"to_id": id})
+        assert stored == cached == index[id] == expected, (id, stored, cached, index[id], expected)
+        assert events == sum(1 for to_id, _ in amounts if to_id == id), (id, events)
+
+    print(f"{gives} concurrent gives to {receivers} users in {elapsed:.2f}s, no lost updates")
+    await close_settings(settings)
+
+
+if __name__ == "__main__":
+    import sys
+
+    gives = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    receivers = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.get_event_loop().run_until_complete(check(gives, receivers))
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from benchmarks.fakes import FakeBot, FakeGuild, FakeMember
+from cogs.monitors.antiraid import AntiRaidMonitor
+
+"""
+Benchmark: time to ban a raid's worth of members, with the Discord ban requests sent one
+at a time vs. `ban_concurrency` at a time. Discord and the database are stand-ins, the
+bans take a fixed latency and the cases a single simulated round trip.
+
+Run from the repository root with `python -m benchmarks.raid_ban [members] [ban latency in ms]`
+"""
+
+
+class FakeSettings:
+    def __init__(self):
+        self.next_case_id = 1
+
+    def guild(self):
+        return type("FakeGuildDocument", (), {"channel_modlogs": 1})()
+
+    async def create_cases(self, cases):
+        # one database round trip
+        await asyncio.sleep(0.005)
+        for _id, case in cases:
+            case._id = self.next_case_id
+            case.user_id = _id
+            self.next_case_id += 1
+        return [case for _, case in cases]
+
+
+async def run(count: int, latency: float, concurrency: int) -> float:
+    guild = FakeGuild(ban_latency=latency)
+    members = [FakeMember(guild, 1000 + i) for i in range(count)]
+    guild.members = {member.id: member for member in members}
+
+    monitor = AntiRaidMonitor(FakeBot(FakeSettings()))
+    monitor.ban_concurrency = concurrency
+
+    start = time.perf_counter()
+    banned = await monitor.raid_ban_batch(members, reason="Join spam detected.")
+    elapsed = time.perf_counter() - start
+
+    # everyone banned, one summary in the mod logs
+    assert len(banned) == guild.bans == count and len(guild.channel.sent) == 1
+    return elapsed
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    loop = asyncio.get_event_loop()
+    print(f"banning {count} members, {latency * 1000:.0f}ms per ban request")
+    for concurrency in (1, 5):
+        print(f"    {concurrency} ban(s) in flight: {loop.run_until_complete(run(count, latency, concurrency)):.2f}s")
@@ -81,6 +81,10 @@ class Stats(commands.Cog):
         embed.add_field(name="Memory Usage",
                         value=f"{floor(process.memory_info().rss/1000/1000)} MB")
         embed.add_field(name="Python Version", value=platform.python_version())
+        embed.add_field(name="Guild cache",
+                        value=f"{ctx.settings.guild_cache_hits} hits / {ctx.settings.guild_cache_misses} misses")
+        embed.add_field(name="Invite cache",
+                        value=f"{floor(self.bot.invite_cache.hit_rate * 100)}% hit rate ({self.bot.invite_cache.hits} hits / {self.bot.invite_cache.misses} misses)")
 
         await ctx.message.reply(embed=embed)
 
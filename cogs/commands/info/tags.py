@@ -19,7 +19,7 @@ class TagsSource(menus.GroupByPageSource):
             argo = " [args]" if tag.args else ""
             if (argo != ""):
                 res += argo
-            embed.add_field(name=f'!t {tag.name}{argo}', value=f'**ID**: {tag._id}\n**Supports arguments**: {tag.args}\n**Creator**: {tag.added_by_tag}\n**Number of uses**: {tag.use_count}')
+            embed.add_field(name=f'!t {tag.name}{argo}', value=f'**ID**: {tag._id}\n**Supports arguments**: {tag.args}\n**Creator**: {tag.added_by_tag}\n**Number of uses**: {menu.ctx.settings.tag_uses(tag)}')
         return embed
 
 
@@ -158,9 +158,13 @@ class Tags(commands.Cog):
         if tag is None:
             raise commands.BadArgument("That tag does not exist.")
         
-        file = tag.image.read()
-        if file is not None:
-            file = discord.File(BytesIO(file), filename="image.gif" if tag.image.content_type == "image/gif" else "image.png")
+        ctx.settings.use_tag(tag)
+        file = None
+        image = await ctx.settings.tag_image(tag)
+        if image is not None:
+            data, content_type = image
+            # BytesIO shares the cached bytes instead of copying them
+            file = discord.File(BytesIO(data), filename="image.gif" if content_type == "image/gif" else "image.png")
         response = await self.tag_response(tag, args)
         await ctx.message.reply(response, file=file, mention_author=False)
 
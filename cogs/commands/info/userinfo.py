@@ -7,8 +7,25 @@ import discord
 from discord.ext import commands, menus
 
 
-class CasesSource(menus.GroupByPageSource):
-    async def format_page(self, menu, entry):
+class CasesSource(menus.PageSource):
+    """Pages through a user's cases, fetching one page at a time from the database."""
+
+    def __init__(self, settings, user_id: int, count: int, per_page: int = 9):
+        self.settings = settings
+        self.user_id = user_id
+        self.per_page = per_page
+        self.max_pages = max(1, -(-count // per_page))
+
+    def is_paginating(self):
+        return self.max_pages > 1
+
+    def get_max_pages(self):
+        return self.max_pages
+
+    async def get_page(self, page_number):
+        return await self.settings.cases(self.user_id, skip=page_number * self.per_page, limit=self.per_page)
+
+    async def format_page(self, menu, entries):
         pun_map = {
             "KICK": "Kicked",
             "BAN": "Banned",
@@ -21,7 +38,7 @@ class CasesSource(menus.GroupByPageSource):
         embed = discord.Embed(
             title=f'Cases', color=discord.Color.blurple())
         embed.set_author(name=user, icon_url=user.avatar_url)
-        for case in entry.items:
+        for case in entries:
             timestamp = case.date.strftime("%B %d, %Y, %I:%M %p")
             if case._type == "WARN" or case._type == "LIFTWARN":
                 if case.lifted:
@@ -162,18 +179,16 @@ class UserInfo(commands.Cog):
                     f"Couldn't find user with ID {user}")
             ctx.args[2] = user
 
-        results = await ctx.settings.cases(user.id)
-        if len(results.cases) == 0:
+        count = await ctx.settings.count_cases(user.id)
+        if count == 0:
             if isinstance(user, int):
                 raise commands.BadArgument(
                     f'User with ID {user.id} had no cases.')
             else:
                 raise commands.BadArgument(f'{user.mention} had no cases.')
-        cases = [case for case in results.cases if case._type != "UNMUTE"]
-        cases.reverse()
 
         menus = MenuPages(source=CasesSource(
-            cases, key=lambda t: 1, per_page=9), clear_reactions_after=True)
+            ctx.settings, user.id, count, per_page=9), clear_reactions_after=True)
         await menus.start(ctx)
 
     @cases.error
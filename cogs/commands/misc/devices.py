@@ -1,9 +1,8 @@
-import json
 import traceback
 
-import aiohttp
 import cogs.utils.context as context
 import cogs.utils.permission_checks as permissions
+from cogs.utils.device_data import DeviceData
 from discord import Color, Embed
 from discord.ext import commands, menus
 
@@ -31,6 +30,15 @@ class NewMenuPages(menus.MenuPages):
 class Devices(commands.Cog):    
     def __init__(self, bot):
         self.bot = bot
+        self.device_data = DeviceData(bot)
+
+    def cog_unload(self):
+        self.device_data.close()
+
+    async def devices(self) -> DeviceData:
+        if not await self.device_data.wait_ready():
+            raise commands.BadArgument("Error connecting to the feed! Please try again later")
+        return self.device_data
     
     @commands.command(name='board2device', aliases=['b2d'])
     async def board2device(self, ctx: context.Context, board: str):
@@ -50,24 +58,14 @@ class Devices(commands.Cog):
         # case insensitivity
         board = board.lower()
 
-        # fetch data from skylar's API
-        response = ""
-        async with aiohttp.ClientSession() as session:
-            response = await fetch(session, 'https://raw.githubusercontent.com/skylartaylor/cros-updates/master/src/data/cros-updates.json')
-            if response is None:
-                return
-
-        # str -> JSON
-        response = json.loads(response)
-        # loop through response to find a matching board name
-        for device in response:
-            # if we find a match, send response
-            if device["Codename"] == board:
-                await ctx.message.reply(embed=Embed(title=f'{device["Codename"]} belongs to...', color=Color(value=0x37b83b), description=device["Brand names"]).set_footer(text=f"Powered by https://cros.tech/ (by Skylar), requested by {ctx.author.name}#{ctx.author.discriminator}", icon_url=ctx.author.avatar_url))
-                return
-        
+        # look up the board in skylar's data
+        devices = await self.devices()
+        device = devices.get(board)
         # no match, send error response
-        raise commands.BadArgument("A board with that name was not found!")
+        if device is None:
+            raise commands.BadArgument("A board with that name was not found!")
+
+        await ctx.message.reply(embed=Embed(title=f'{device["Codename"]} belongs to...', color=Color(value=0x37b83b), description=device["Brand names"]).set_footer(text=f"Powered by https://cros.tech/ (by Skylar), requested by {ctx.author.name}#{ctx.author.discriminator}", icon_url=ctx.author.avatar_url))
 
     
     @commands.command(name='device2board', aliases=['d2b'])
@@ -90,16 +88,8 @@ class Devices(commands.Cog):
 
         search_term = search_term.lower()
 
-        response = ""
-        async with aiohttp.ClientSession() as session:
-            response = await fetch(session, 'https://raw.githubusercontent.com/skylartaylor/cros-updates/master/src/data/cros-updates.json')
-            if response is None:
-                return
-
-        devices = json.loads(response)
-
-        search_results = [(device["Codename"], device["Brand names"])
-                          for device in devices if 'Brand names' in device and search_term in device['Brand names'].lower()]
+        devices = await self.devices()
+        search_results = devices.search(search_term)
         if len(search_results) == 0:
             raise commands.BadArgument("A board with that name was not found!")
         else:
@@ -130,47 +120,36 @@ class Devices(commands.Cog):
         # case insensitivity
         board = board.lower()
 
-        # fetch data from skylar's API
-        data = ""
-        async with aiohttp.ClientSession() as session:
-            data = await fetch(session, 'https://raw.githubusercontent.com/skylartaylor/cros-updates/master/src/data/cros-updates.json')
-            if data is None:
-                return
-        
-        #parse response to json
-        data = json.loads(data)
-        # loop through response to find board
-        for data_board in data:
-            # did we find a match
-            if data_board['Codename'] == board:
-                # yes, send the data
-                embed = Embed(title=f"ChromeOS update status for {board}", color=Color(value=0x37b83b))
-                version = data_board["Stable"].split("<br>")
-                embed.add_field(name=f'Stable Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
-                
-                version = data_board["Beta"].split("<br>")
-                if len(version) == 2:
-                    embed.add_field(name=f'Beta Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
-                else:
-                    embed.add_field(name=f'Beta Channel', value=f'**Version**: {data_board["Beta"]}')
-                
-                version = data_board["Dev"].split("<br>")
-                if len(version) == 2:
-                    embed.add_field(name=f'Dev Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
-                else:
-                    embed.add_field(name=f'Dev Channel', value=f'**Version**: {data["Dev"]}')
-                
-                if (data_board["Canary"] is not None):
-                    version = data_board["Canary"].split("<br>")
-                    if len(version) == 2:
-                        embed.add_field(name=f'Canary Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
-                
-                embed.set_footer(text=f"Powered by https://cros.tech/ (by Skylar), requested by {ctx.author.name}#{ctx.author.discriminator}", icon_url=ctx.author.avatar_url)
-                await ctx.message.reply(embed=embed)
-                return
-
+        # look up the board in skylar's data
+        devices = await self.devices()
+        data_board = devices.get(board)
         # board not found, error
-        raise commands.BadArgument("Couldn't find a result with that boardname!")
+        if data_board is None:
+            raise commands.BadArgument("Couldn't find a result with that boardname!")
+
+        embed = Embed(title=f"ChromeOS update status for {board}", color=Color(value=0x37b83b))
+        version = data_board["Stable"].split("<br>")
+        embed.add_field(name=f'Stable Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
+        
+        version = data_board["Beta"].split("<br>")
+        if len(version) == 2:
+            embed.add_field(name=f'Beta Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
+        else:
+            embed.add_field(name=f'Beta Channel', value=f'**Version**: {data_board["Beta"]}')
+        
+        version = data_board["Dev"].split("<br>")
+        if len(version) == 2:
+            embed.add_field(name=f'Dev Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
+        else:
+            embed.add_field(name=f'Dev Channel', value=f'**Version**: {data_board["Dev"]}')
+        
+        if (data_board["Canary"] is not None):
+            version = data_board["Canary"].split("<br>")
+            if len(version) == 2:
+                embed.add_field(name=f'Canary Channel', value=f'**Version**: {version[1]}\n**Platform**: {version[0]}')
+        
+        embed.set_footer(text=f"Powered by https://cros.tech/ (by Skylar), requested by {ctx.author.name}#{ctx.author.discriminator}", icon_url=ctx.author.avatar_url)
+        await ctx.message.reply(embed=embed)
             
     @updates.error
     @board2device.error
@@ -186,15 +165,5 @@ class Devices(commands.Cog):
             await ctx.send_error("A fatal error occured. Tell <@109705860275539968> about this.")
             traceback.print_exc()
             
-async def fetch(session, url):
-    try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                return await response.text()
-            else:
-                raise commands.BadArgument("Error connecting to the feed! Please try again later")
-    except aiohttp.ClientConnectionError:
-        raise commands.BadArgument("Error connecting to the feed! Please try again later")
-
 def setup(bot):
     bot.add_cog(Devices(bot))
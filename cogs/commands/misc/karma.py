@@ -1,4 +1,3 @@
-import datetime
 import traceback
 import typing
 
@@ -19,6 +18,26 @@ class NewMenuPages(menus.MenuPages):
         await super().update(payload)
 
 
+class HistorySource(menus.PageSource):
+    """Pages through a user's karma history, fetching one page at a time from the database."""
+
+    def __init__(self, settings, user_id: int, count: int, given: bool, per_page: int = 10):
+        self.settings = settings
+        self.user_id = user_id
+        self.given = given
+        self.per_page = per_page
+        self.max_pages = max(1, -(-count // per_page))
+
+    def is_paginating(self):
+        return self.max_pages > 1
+
+    def get_max_pages(self):
+        return self.max_pages
+
+    async def get_page(self, page_number):
+        return await self.settings.karma_history(self.user_id, given=self.given, skip=page_number * self.per_page, limit=self.per_page)
+
+
 class Karma(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -89,14 +108,12 @@ class Karma(commands.Cog):
             "Karma value"
         """
 
-        m = await ctx.settings.user(member.id)
-        m.karma = val
-        m.save()
+        await ctx.settings.set_karma(member.id, val)
         
         embed = discord.Embed(title=f"Updated {member}'s karma!",
                       color=discord.Color(value=0x37b83b))
         embed.description = ""
-        embed.description += f'**Current karma**: {m.karma}\n'
+        embed.description += f'**Current karma**: {val}\n'
         embed.set_footer(
             text=f'Requested by {ctx.author.name}#{ctx.author.discriminator}', icon_url=ctx.author.avatar_url)
         await ctx.message.reply(embed=embed)
@@ -133,33 +150,14 @@ class Karma(commands.Cog):
             raise commands.BadArgument(
                 "You can't give yourself karma")
         
-        receiver = await ctx.settings.user(member.id)
-        receive_action = {
-            "amount": val,
-            "from": ctx.author.id,
-            "date": datetime.datetime.now(),
-            "reason": reason
-        }
-        receiver.karma += val
-        receiver.karma_received_history.append(receive_action)
-        receiver.save()
-        
-        giver = await ctx.settings.user(ctx.author.id)
-        give_action = {
-            "amount": val,
-            "to": member.id,
-            "date": datetime.datetime.now(),
-            "reason": reason
-        }
-        giver.karma_given_history.append(give_action)
-        giver.save()
+        karma = await ctx.settings.add_karma(ctx.author.id, member.id, val, reason)
         
         embed = discord.Embed(title=f"Updated {member.name}#{member.discriminator}'s karma!",
                       color=discord.Color(value=0x37b83b))
         embed.description = ""
 
         embed.description += f'**Karma given**: {val}\n'
-        embed.description += f'**Current karma**: {receiver.karma}\n'
+        embed.description += f'**Current karma**: {karma}\n'
         embed.description += f'**Reason**: {reason}'
         embed.set_footer(
             text=f'Requested by {ctx.author.name}#{ctx.author.discriminator}', icon_url=ctx.author.avatar_url)
@@ -199,33 +197,14 @@ class Karma(commands.Cog):
         
         val = (-1) * val
         
-        receiver = await ctx.settings.user(member.id)
-        receive_action = {
-            "amount": val,
-            "from": ctx.author.id,
-            "date": datetime.datetime.now(),
-            "reason": reason
-        }
-        receiver.karma += val
-        receiver.karma_received_history.append(receive_action)
-        receiver.save()
-        
-        giver = await ctx.settings.user(ctx.author.id)
-        give_action = {
-            "amount": val,
-            "to": member.id,
-            "date": datetime.datetime.now(),
-            "reason": reason
-        }
-        giver.karma_given_history.append(give_action)
-        giver.save()
+        karma = await ctx.settings.add_karma(ctx.author.id, member.id, val, reason)
         
         embed = discord.Embed(title=f"Updated {member.name}#{member.discriminator}'s karma!",
                       color=discord.Color(value=0x37b83b))
         embed.description = ""
 
         embed.description += f'**Karma taken**: {(-1) * val}\n'
-        embed.description += f'**Current karma**: {receiver.karma}\n'
+        embed.description += f'**Current karma**: {karma}\n'
         embed.description += f'**Reason**: {reason}'
         embed.set_footer(
             text=f'Requested by {ctx.author.name}#{ctx.author.discriminator}', icon_url=ctx.author.avatar_url)
@@ -246,28 +225,28 @@ class Karma(commands.Cog):
             "Member whose karma history to get"
         """
 
-        class Source(menus.GroupByPageSource):
-            async def format_page(self, menu, entry):
+        class Source(HistorySource):
+            async def format_page(self, menu, entries):
                 embed = discord.Embed(
                     title=f'History: Page {menu.current_page +1}/{self.get_max_pages()}', color=discord.Color(value=0xfcba03))
-                for v in entry.items:
-                    invoker_text = f"<@{v['from']}>"
+                for v in entries:
+                    invoker_text = f"<@{v.from_id}>"
                     
-                    if v["amount"] < 0:
+                    if v.amount < 0:
                         embed.add_field(
-                            name=f'{humanize.naturaltime(v["date"])}', value=f'{invoker_text} took {v["amount"]} karma from {member.mention}\n**Reason**: {v["reason"]}', inline=False)
+                            name=f'{humanize.naturaltime(v.date)}', value=f'{invoker_text} took {v.amount} karma from {member.mention}\n**Reason**: {v.reason}', inline=False)
                     else:
                         embed.add_field(
-                            name=f'{humanize.naturaltime(v["date"])}', value=f'{invoker_text} gave {v["amount"]} karma to {member.mention}\n**Reason**: {v["reason"]}', inline=False)
+                            name=f'{humanize.naturaltime(v.date)}', value=f'{invoker_text} gave {v.amount} karma to {member.mention}\n**Reason**: {v.reason}', inline=False)
                 return embed
         
-        data = sorted((await ctx.settings.user(member.id)).karma_received_history, key=lambda d: d['date'], reverse=True)
+        count = await ctx.settings.count_karma_history(member.id)
         
-        if (len(data) == 0):
+        if (count == 0):
             raise commands.BadArgument("This user had no history.")
        
         pages = NewMenuPages(source=Source(
-            data, key=lambda t: 1, per_page=10), clear_reactions_after=True)
+            ctx.settings, member.id, count, given=False, per_page=10), clear_reactions_after=True)
         await pages.start(ctx)
         
     @karma.command()
@@ -285,28 +264,28 @@ class Karma(commands.Cog):
             Member whose karma history to get
         """
 
-        class Source(menus.GroupByPageSource):
-            async def format_page(self, menu, entry):
+        class Source(HistorySource):
+            async def format_page(self, menu, entries):
                 embed = discord.Embed(
                     title=f'History: Page {menu.current_page +1}/{self.get_max_pages()}', color=discord.Color(value=0xfcba03))
-                for v in entry.items:
-                    target = f"<@{v['to']}>"
+                for v in entries:
+                    target = f"<@{v.to_id}>"
                     
-                    if v["amount"] < 0:
+                    if v.amount < 0:
                         embed.add_field(
-                            name=f'{humanize.naturaltime(v["date"])}', value=f'{member.mention} took {v["amount"]} karma from {target}\n**Reason**: {v["reason"]}', inline=False)
+                            name=f'{humanize.naturaltime(v.date)}', value=f'{member.mention} took {v.amount} karma from {target}\n**Reason**: {v.reason}', inline=False)
                     else:
                         embed.add_field(
-                            name=f'{humanize.naturaltime(v["date"])}', value=f'{member.mention} gave {v["amount"]} karma to {target}\n**Reason**: {v["reason"]}', inline=False)
+                            name=f'{humanize.naturaltime(v.date)}', value=f'{member.mention} gave {v.amount} karma to {target}\n**Reason**: {v.reason}', inline=False)
                 return embed
         
-        data = sorted((await ctx.settings.user(member.id)).karma_given_history, key=lambda d: d['date'], reverse=True)
+        count = await ctx.settings.count_karma_history(member.id, given=True)
         
-        if (len(data) == 0):
+        if (count == 0):
             raise commands.BadArgument("This user had no history.")
        
         pages = NewMenuPages(source=Source(
-            data, key=lambda t: 1, per_page=10), clear_reactions_after=True)
+            ctx.settings, member.id, count, given=True, per_page=10), clear_reactions_after=True)
         await pages.start(ctx)
 
     @commands.command(name="leaderboard", aliases=["lb"])
@@ -324,43 +303,38 @@ class Karma(commands.Cog):
                                  text="Note: Nerds and Moderators were excluded from these results.")
                 embed.description = ""
 
-                for i, user in enumerate(entry.items):
-                    member = menu.ctx.guild.get_member(user._id)
+                for i, (user_id, karma) in enumerate(entry.items):
+                    member = menu.ctx.guild.get_member(user_id)
                     member_found =  member is not None
                     if not member_found:
-                        if user._id not in menu.ctx.user_cache:
+                        if user_id not in menu.ctx.user_cache:
                             try:
-                                member = await menu.ctx.bot.fetch_user(user._id)
-                                menu.ctx.user_cache[user._id] = member
+                                member = await menu.ctx.bot.fetch_user(user_id)
+                                menu.ctx.user_cache[user_id] = member
                             except Exception:
                                 member = None
 
                         else:
-                            member = menu.ctx.user_cache[user._id]
+                            member = menu.ctx.user_cache[user_id]
                                                 
-                    embed.add_field(name=f"Rank {i+1}", value=f"{member.mention} ({member})\n{user.karma} karma", inline=False)
+                    embed.add_field(name=f"Rank {i+1}", value=f"{member.mention} ({member})\n{karma} karma", inline=False)
 
                 return embed
 
-        data = await ctx.settings.leaderboard()
+        def include(user_id):
+            # Nerds and Moderators are left out, unless the full leaderboard was asked for
+            member = ctx.guild.get_member(user_id)
+            if member and full is None:
+                return not ctx.settings.permissions.hasAtLeast(member.guild, member, 1)
+            return True
+
+        data = await ctx.settings.leaderboard(include=include)
         
         if (len(data) == 0):
            raise commands.BadArgument("No history in this guild!")
         else:
-            data_final = []
-            for u in data:
-                member = ctx.guild.get_member(u._id)    
-                if member:
-                    if full is None:
-                        if not ctx.settings.permissions.hasAtLeast(member.guild, member, 1):
-                            data_final.append(u)
-                    else:
-                        data_final.append(u)
-                else:
-                    data_final.append(u)
-                    
             pages = NewMenuPages(source=Source(
-                data_final, key=lambda t: 1, per_page=10), clear_reactions_after=True)
+                data, key=lambda t: 1, per_page=10), clear_reactions_after=True)
             await pages.start(ctx)
   
     @karma.error
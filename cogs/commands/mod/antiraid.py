@@ -151,12 +151,7 @@ class AntiRaid(commands.Cog):
         """
         
         profile = await ctx.settings.user(user.id)
-        if mode is None:
-            profile.raid_verified = not profile.raid_verified
-        else:
-            profile.raid_verified = mode
-        
-        profile.save()
+        ctx.settings.update_user(profile, raid_verified=not profile.raid_verified if mode is None else mode)
         
         await ctx.settings.set_spam_mode(mode)
         await ctx.send_success(description=f"{'**Verified**' if profile.raid_verified else '**Unverified**'} user {user.mention}.", delete_after=5)
@@ -56,8 +56,7 @@ class Filters(commands.Cog):
         if val is None:
             val = not cur.offline_report_ping 
 
-        cur.offline_report_ping = val
-        cur.save()
+        ctx.settings.update_user(cur, offline_report_ping=val)
 
         if val:
             await ctx.message.delete(delay=5)
@@ -65,14 +65,11 @@ class ModActions(commands.Cog):
                 raise commands.BadArgument(
                     f"Couldn't find user with ID {user}")
 
-        guild = ctx.settings.guild()
-
         reason = discord.utils.escape_markdown(reason)
         reason = discord.utils.escape_mentions(reason)
 
         # prepare the case object for database
         case = Case(
-            _id=guild.case_id,
             _type="WARN",
             mod_id=ctx.author.id,
             mod_tag=str(ctx.author),
@@ -80,10 +77,7 @@ class ModActions(commands.Cog):
             punishment="WARN"
         )
 
-        # increment case ID in database for next available case ID
-        await ctx.settings.inc_caseid()
-        # add new case to DB
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
 
         # prepare log embed, send to user, channel where invoked
         log = await logging.prepare_warn_log(ctx.author, user, case)
@@ -125,8 +119,7 @@ class ModActions(commands.Cog):
         """
 
         # retrieve user's case with given ID
-        cases = await ctx.settings.get_case(user.id, case_id)
-        case = cases.cases.filter(_id=case_id).first()
+        case = await ctx.settings.get_case(user.id, case_id)
 
         reason = discord.utils.escape_markdown(reason)
         reason = discord.utils.escape_mentions(reason)
@@ -148,7 +141,7 @@ class ModActions(commands.Cog):
         case.lifted_by_tag = str(ctx.author)
         case.lifted_by_id = ctx.author.id
         case.lifted_date = datetime.datetime.now()
-        cases.save()
+        await ctx.settings.update_case(case)
 
         dmed = True
         # prepare log embed, send to user, channel where invoked
@@ -187,8 +180,7 @@ class ModActions(commands.Cog):
         """
 
         # retrieve user's case with given ID
-        cases = await ctx.settings.get_case(user.id, case_id)
-        case = cases.cases.filter(_id=case_id).first()
+        case = await ctx.settings.get_case(user.id, case_id)
 
         new_reason = discord.utils.escape_markdown(new_reason)
         new_reason = discord.utils.escape_mentions(new_reason)
@@ -201,7 +193,7 @@ class ModActions(commands.Cog):
         old_reason = case.reason
         case.reason = new_reason
         case.date = datetime.datetime.now()
-        cases.save()
+        await ctx.settings.update_case(case, old_reason=old_reason)
         
         dmed = True
         log = await logging.prepare_editreason_log(ctx.author, user, case, old_reason)
@@ -263,17 +255,13 @@ class ModActions(commands.Cog):
     async def add_kick_case(self, ctx: context.Context, user, reason):
         # prepare case for DB
         case = Case(
-            _id=ctx.settings.guild().case_id,
             _type="KICK",
             mod_id=ctx.author.id,
             mod_tag=str(ctx.author),
             reason=reason,
         )
 
-        # increment max case ID for next case
-        await ctx.settings.inc_caseid()
-        # add new case to DB
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
 
         return await logging.prepare_kick_log(ctx.author, user, case)
 
@@ -335,7 +323,6 @@ class ModActions(commands.Cog):
     async def add_ban_case(self, ctx: context.Context, user, reason):
         # prepare the case to store in DB
         case = Case(
-            _id=ctx.settings.guild().case_id,
             _type="BAN",
             mod_id=ctx.author.id,
             mod_tag=str(ctx.author),
@@ -343,10 +330,7 @@ class ModActions(commands.Cog):
             reason=reason,
         )
 
-        # increment DB's max case ID for next case
-        await ctx.settings.inc_caseid()
-        # add case to db
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
         # prepare log embed to send to user and context
         return await logging.prepare_ban_log(ctx.author, user, case)
 
@@ -386,14 +370,12 @@ class ModActions(commands.Cog):
             raise commands.BadArgument(f"{user} is not banned.")
 
         case = Case(
-            _id=ctx.settings.guild().case_id,
             _type="UNBAN",
             mod_id=ctx.author.id,
             mod_tag=str(ctx.author),
             reason=reason,
         )
-        await ctx.settings.inc_caseid()
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
 
         log = await logging.prepare_unban_log(ctx.author, user, case)
         await ctx.message.reply(embed=log)
@@ -475,7 +457,6 @@ class ModActions(commands.Cog):
             raise commands.BadArgument("This user is already muted.")
 
         case = Case(
-            _id=ctx.settings.guild().case_id,
             _type="MUTE",
             date=now,
             mod_id=ctx.author.id,
@@ -496,11 +477,9 @@ class ModActions(commands.Cog):
         else:
             case.punishment = "PERMANENT"
 
-        await ctx.settings.inc_caseid()
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
         u = await ctx.settings.user(id=user.id)
-        u.is_muted = True
-        u.save()
+        ctx.settings.update_user(u, is_muted=True)
 
         await user.add_roles(mute_role)
 
@@ -545,8 +524,7 @@ class ModActions(commands.Cog):
         await user.remove_roles(mute_role)
 
         u = await ctx.settings.user(id=user.id)
-        u.is_muted = False
-        u.save()
+        ctx.settings.update_user(u, is_muted=False)
 
         try:
             ctx.tasks.cancel_unmute(user.id)
@@ -554,14 +532,12 @@ class ModActions(commands.Cog):
             pass
 
         case = Case(
-            _id=ctx.settings.guild().case_id,
             _type="UNMUTE",
             mod_id=ctx.author.id,
             mod_tag=str(ctx.author),
             reason=reason,
         )
-        await ctx.settings.inc_caseid()
-        await ctx.settings.add_case(user.id, case)
+        await ctx.settings.create_case(user.id, case)
 
         log = await logging.prepare_unmute_log(ctx.author, user, case)
 
@@ -1,15 +1,15 @@
-import string
+import asyncio
 from asyncio import Lock
 from datetime import datetime, timedelta, timezone
 
 import cogs.utils.context as context
 import cogs.utils.logs as logger
 from cogs.utils.message_cooldown import MessageTextBucket
+from cogs.utils.normalize import normalize_message
 import discord
 from data.case import Case
 from discord.ext import commands
 from expiringdict import ExpiringDict
-from fold_to_ascii import fold
 
 
 class RaidType:
@@ -48,6 +48,8 @@ class AntiRaidMonitor(commands.Cog):
         # locks to prevent race conditions when banning concurrently
         self.join_overtime_lock = Lock()
         self.banning_lock = Lock()
+        # how many Discord ban requests a raid ban batch may have in flight at once
+        self.ban_concurrency = 5
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -75,17 +77,17 @@ class AntiRaidMonitor(commands.Cog):
         
         # if ratelimit is triggered, we should ban all the users that joined in the past 8 seconds
         if join_spam_detection_bucket.update_rate_limit(current):
-            users = list(self.join_user_mapping.keys())
-            for user in users:
+            users = []
+            for user in list(self.join_user_mapping.keys()):
                 try:
-                    user = self.join_user_mapping[user]
+                    users.append(self.join_user_mapping[user])
                 except KeyError:
                     continue
                 
-                try:
-                    await self.raid_ban(user, reason="Join spam detected.")
-                except Exception:
-                    pass
+            try:
+                await self.raid_ban_batch(users, reason="Join spam detected.")
+            except Exception:
+                pass
                 
             raid_alert_bucket = self.raid_alert_cooldown.get_bucket(member)
             if not raid_alert_bucket.update_rate_limit(current):
@@ -141,9 +143,13 @@ class AntiRaidMonitor(commands.Cog):
         current = member.joined_at.replace(tzinfo=timezone.utc).timestamp()
         if bucket.update_rate_limit(current):
             users = [ m for m in self.join_overtime_mapping.get(timestamp) ]
-            for user in users:
+            try:
+                banned = await self.raid_ban_batch(users, reason=f"Join spam over time detected (bucket `{timestamp_bucket_for_logging}`)", dm_user=True)
+            except Exception:
+                banned = []
+
+            for user, _ in banned:
                 try:
-                    await self.raid_ban(user, reason=f"Join spam over time detected (bucket `{timestamp_bucket_for_logging}`)", dm_user=True)
                     self.join_overtime_mapping[timestamp].remove(user)
                 except Exception:
                     pass
@@ -198,8 +204,8 @@ class AntiRaidMonitor(commands.Cog):
                     title = "Message spam detected"
                 await self.bot.report.report_spam(message, user, title=title)
             else:
-                users = list(self.spam_user_mapping.keys())
-                for user in users:
+                users = []
+                for user in list(self.spam_user_mapping.keys()):
                     try:
                         _ = self.spam_user_mapping[user]
                     except KeyError:
@@ -208,11 +214,12 @@ class AntiRaidMonitor(commands.Cog):
                     user = message.guild.get_member(user)
                     if user is None:
                         continue
+                    users.append(user)
                     
-                    try:
-                        await self.raid_ban(user, reason="Ping spam detected" if raid_type is RaidType.PingSpam else "Message spam detected")
-                    except Exception:
-                        pass
+                try:
+                    await self.raid_ban_batch(users, reason="Ping spam detected" if raid_type is RaidType.PingSpam else "Message spam detected")
+                except Exception:
+                    pass
 
     async def ping_spam(self, message):
         """If a user pings more than 5 people, or pings more than 2 roles, mute them.
@@ -266,71 +273,135 @@ class AntiRaidMonitor(commands.Cog):
         if self.bot.settings.permissions.hasAtLeast(message.guild, message.author, 2):
             return False
 
-        #TODO: Unify filtering system
-        symbols = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
-                u"abBrdeex3nnKnmHonpcTyoxu4wwbbbeoRABBrDEEX3NNKNMHONPCTyOXU4WWbbbEOR")
-
-        tr = {ord(a): ord(b) for a, b in zip(*symbols)}
-
-        folded_message = fold(message.content.translate(tr).lower()).lower()
-        folded_without_spaces = "".join(folded_message.split())
-        folded_without_spaces_and_punctuation = folded_without_spaces.translate(str.maketrans('', '', string.punctuation))
-
-        if folded_message:
-            for word in self.bot.settings.guild().raid_phrases:
-                if not self.bot.settings.permissions.hasAtLeast(message.guild, message.author, word.bypass):
-                    if (word.word.lower() in folded_message) or \
-                        (not word.false_positive and word.word.lower() in folded_without_spaces) or \
-                        (not word.false_positive and word.word.lower() in folded_without_spaces_and_punctuation):
-                        # remove all whitespace, punctuation in message and run filter again
-                        if word.false_positive and word.word.lower() not in folded_message.split():
-                            continue
-
-                        ctx = await self.bot.get_context(message, cls=context.Context)
-                        await self.raid_ban(message.author)
-                        return True
+        # shares the normalized forms with the word filter for the same message
+        normalized = normalize_message(message)
+
+        if normalized.folded:
+            level = self.bot.settings.permissions.level(message.guild, message.author)
+            for word in self.bot.settings.raid_phrase_filter().match(normalized, level):
+                # false positive phrases must appear as a whole word
+                if word.false_positive and word.word.lower() not in normalized.folded.split():
+                    continue
+
+                await self.raid_ban(message.author)
+                return True
         return False
             
     async def raid_ban(self, user: discord.Member, reason="Raid phrase detected", dm_user=False):
-        """Helper function to ban users"""
-        
+        """Helper function to ban a single user"""
+
+        await self.raid_ban_batch([user], reason=reason, dm_user=dm_user)
+
+    async def raid_ban_batch(self, users: list, reason="Raid phrase detected", dm_user=False) -> list:
+        """Ban a batch of users caught by the antiraid filters. Targets are deduplicated,
+        their cases are allocated with a single bulk write, and the Discord bans are sent
+        concurrently (at most `self.ban_concurrency` at a time, discord.py takes care of
+        the actual rate limit buckets). One summary is posted to the mod logs at the end.
+
+        Parameters
+        ----------
+        users : list
+            The members (or users) to ban
+        reason : str, optional
+            Reason for the ban cases
+        dm_user : bool, optional
+            Whether to DM the users before banning them
+
+        Returns
+        -------
+        list
+            The (user, case) pairs of the users that were banned.
+        """
+
+        # only hold the lock while picking out users that we haven't banned yet
+        targets = []
         async with self.banning_lock:
-            if self.ban_user_mapping.get(user.id) is not None:
-                return
-            else:
+            for user in users:
+                if self.ban_user_mapping.get(user.id) is not None:
+                    continue
                 self.ban_user_mapping[user.id] = 1
+                targets.append(user)
+
+        if not targets:
+            return []
+
+        now = datetime.now()
+        cases = [Case(
+            _type="BAN",
+            date=now,
+            mod_id=self.bot.user.id,
+            mod_tag=str(self.bot.user),
+            punishment="PERMANENT",
+            reason=reason
+        ) for _ in targets]
+
+        # allocate all the case IDs and add the cases to DB in one go
+        await self.bot.settings.create_cases([(user.id, case) for user, case in zip(targets, cases)])
+
+        semaphore = asyncio.Semaphore(self.ban_concurrency)
+
+        async def ban(user, case):
+            async with semaphore:
+                if dm_user:
+                    log = await logger.prepare_ban_log(self.bot.user, user, case)
+                    try:
+                        await user.send(f"You were banned from {user.guild.name}.\n\nThis action was performed automatically. If you think this was a mistake, please send a message here: https://www.reddit.com/message/compose?to=%2Fr%2FJailbreak", embed=log)
+                    except Exception:
+                        pass
 
-            case = Case(
-                _id=self.bot.settings.guild().case_id,
-                _type="BAN",
-                date=datetime.now(),
-                mod_id=self.bot.user.id,
-                mod_tag=str(self.bot.user),
-                punishment="PERMANENT",
-                reason=reason
-            )
-
-            await self.bot.settings.inc_caseid()
-            await self.bot.settings.add_case(user.id, case)
-            
-            log = await logger.prepare_ban_log(self.bot.user, user, case)
-            
-            if dm_user:
                 try:
-                    await user.send(f"You were banned from {user.guild.name}.\n\nThis action was performed automatically. If you think this was a mistake, please send a message here: https://www.reddit.com/message/compose?to=%2Fr%2FJailbreak", embed=log)
+                    if user.guild.get_member(user.id) is not None:
+                        await user.ban(reason="Raid")
+                    else:
+                        await user.guild.ban(discord.Object(id=user.id), reason="Raid")
                 except Exception:
-                    pass
-            
-            if user.guild.get_member(user.id) is not None:
-                await user.ban(reason="Raid")
-            else:
-                await user.guild.ban(discord.Object(id=user.id), reason="Raid")
-                
-            public_logs = user.guild.get_channel(self.bot.settings.guild().channel_mod_logs)
-            if public_logs:
-                log.remove_author()
-                log.set_thumbnail(url=user.avatar)
-                await public_logs.send(embed=log)
+                    return False
+                return True
+
+        results = await asyncio.gather(*[ban(user, case) for user, case in zip(targets, cases)])
+        banned = [(user, case) for (user, case), ok in zip(zip(targets, cases), results) if ok]
+
+        if banned:
+            await self.send_raid_ban_log(banned[0][0].guild, banned, reason)
+
+        return banned
+
+    async def send_raid_ban_log(self, guild: discord.Guild, banned: list, reason: str):
+        """Post the result of a raid ban to the mod logs. A single ban gets the usual ban log,
+        a batch of bans is aggregated into one summary embed.
+        """
+
+        public_logs = guild.get_channel(self.bot.settings.guild().channel_modlogs)
+        if not public_logs:
+            return
+
+        if len(banned) == 1:
+            user, case = banned[0]
+            log = await logger.prepare_ban_log(self.bot.user, user, case)
+            log.remove_author()
+            log.set_thumbnail(url=user.avatar_url)
+            await public_logs.send(embed=log)
+            return
+
+        case_ids = [case._id for _, case in banned]
+        embed = discord.Embed(title="Raid Members Banned")
+        embed.color = discord.Color.blue()
+        embed.add_field(name="Members", value=str(len(banned)), inline=True)
+        embed.add_field(name="Mod", value=f'{self.bot.user} ({self.bot.user.mention})', inline=True)
+        embed.add_field(name="Reason", value=reason, inline=True)
+
+        lines = ""
+        for i, (user, case) in enumerate(banned):
+            line = f"#{case._id} {user} ({user.id})\n"
+            if len(lines) + len(line) > 1900:
+                lines += f"... and {len(banned) - i} more"
+                break
+            lines += line
+        embed.description = lines
+
+        embed.set_footer(text=f"Cases #{min(case_ids)}-#{max(case_ids)}")
+        embed.timestamp = banned[0][1].date
+        await public_logs.send(embed=embed)
 
     async def freeze_server(self, guild):
         """Freeze all channels marked as freezeable during a raid, meaning only people with the Member+ role and up
@@ -363,3 +434,4 @@ class AntiRaidMonitor(commands.Cog):
 
 def setup(bot):
     bot.add_cog(AntiRaidMonitor(bot))
+
@@ -1,7 +1,8 @@
 import asyncio
+import traceback
 
 import discord
-import feedparser
+from cogs.utils.seen_entries import SeenEntryStore, entry_id
 from discord.ext import commands
 
 
@@ -11,7 +12,8 @@ class CrosBlog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.url = "http://feeds.feedburner.com/GoogleChromeReleases"
-        self.prev_data = feedparser.parse(self.url)
+        # the posts we've already seen
+        self.seen = SeenEntryStore(bot.settings, self.url)
 
         # create thread for loop which watches feed
         self.loop = asyncio.get_event_loop().create_task(self.watcher())
@@ -25,41 +27,39 @@ class CrosBlog(commands.Cog):
         # wait for bot to start
         await self.bot.wait_until_ready()
         while not self.loop.cancelled():
-
-            """ This commented out code doesn't work for feeds that don't support etag/last-modified headers :(
-            # get args for parser -- if feed has modified and etag support, use those as parameters
-            # we use modified and etag data from previous iteration to see if anything changed
-            # between now and the last time we checked the feed
-            kwargs = dict(modified=self.prev_data.modified if hasattr(self.prev_data, 'modified') else None, etag=self.prev_data.etag if hasattr(self.prev_data, 'modified')  else None)
-            data = feedparser.parse(self.url, **{k: v for k, v in kwargs.items() if v is not None})
-
-            # has the feed changed?
-            if (data.status != 304):
-                # yes, check the new entries to see if any are what we want
-                await self.check_new_entries(data.entries)
-            # update local cache to compare against in next iteration
-            # """
-
-            # fetch feed posts
-            data = feedparser.parse(self.url)
-            # determine the newest post date from the cached posts
-            max_prev_date = max([something["published_parsed"]
-                                 for something in self.prev_data.entries])
-            # get a list of posts from the new posts where the date is newer than the max_prev_date
-            new_posts = [
-                post for post in data.entries if post["published_parsed"] > max_prev_date]
-            # new posts?
-            if (len(new_posts) > 0):
-                # check each new post for matching tags
-                for post in new_posts:
-                    print(f'NEW BLOG ENTRY: {post.title} {post.link}')
-                await self.check_new_entries(new_posts)
-
-            # update local cache
-            self.prev_data = data
+            try:
+                await self.check_feed()
+            except Exception:
+                traceback.print_exc()
+                # so that the next poll goes through the same posts again
+                self.bot.feed_fetcher.reset(self.url)
             # wait 1 minute before checking feed again
             await asyncio.sleep(60)
 
+    async def check_feed(self):
+        # fetch feed posts, if the feed changed since we last checked
+        data = await self.bot.feed_fetcher.fetch(self.url)
+        if data is None:
+            return
+
+        if not self.seen.loaded:
+            await self.seen.load()
+
+        if len(self.seen) == 0:
+            # first time we're watching this feed, just remember what's there now
+            await self.seen.add([entry_id(post) for post in data.entries])
+            return
+
+        new_posts = [post for post in data.entries if entry_id(post) not in self.seen]
+        # new posts?
+        if (len(new_posts) > 0):
+            # check each new post for matching tags
+            for post in new_posts:
+                print(f'NEW BLOG ENTRY: {post.title} {post.link}')
+            # mark them as seen first, so that a failure posting them doesn't post them twice
+            await self.seen.add([entry_id(post) for post in new_posts])
+            await self.check_new_entries(new_posts)
+
     async def check_new_entries(self, posts):
         # loop through new entries to see if tags contain one that we want
         # if we find match, post update in channel
@@ -1,7 +1,8 @@
 import asyncio
+import traceback
 
 import discord
-import feedparser
+from cogs.utils.seen_entries import SeenEntryStore, entry_id
 from discord.ext import commands
 
 bott = None
@@ -19,8 +20,6 @@ class DealWatcher(commands.Cog):
                     "https://cdn.discordapp.com/emojis/363434654000349184.png?v=1",
                 'filters': ["deal", "deals"],
                 'requiredFilters': [],
-                'good_feed': False,
-                'prev_data': feedparser.parse('https://www.aboutchromebooks.com/feed/')
             },
             {
                 'feed': "https://www.androidpolice.com/feed/",
@@ -29,8 +28,6 @@ class DealWatcher(commands.Cog):
                     "https://lh4.googleusercontent.com/-2lq9WcxRgB0/AAAAAAAAAAI/AAAAAAAAAQk/u15SBRi49fE/s250-c-k/photo.jpg",
                 'filters': ["deal", "deals", "sale", "sales"],
                 'requiredFilters': ["chromebook", "chromebooks", "chromeos", "chrome os"],
-                'good_feed': True,
-                'prev_data': feedparser.parse('https://www.androidpolice.com/feed/')
 
             },
             {
@@ -40,11 +37,13 @@ class DealWatcher(commands.Cog):
                     "https://images-na.ssl-images-amazon.com/images/I/51L8Vd5bndL._SY355_.png",
                 'filters': ["deal", "deals", "sale", "sales"],
                 'requiredFilters': ["chromebook", "chromebooks", "chromeos", "chrome os" "google chrome os"],
-                'good_feed': True,
-                'prev_data': feedparser.parse('https://www.androidauthority.com/feed/')
             }
         ]
 
+        # the posts we've already seen in each feed
+        for feed in self.feeds:
+            feed["seen"] = SeenEntryStore(bot.settings, feed["feed"])
+
         # create watcher thread for all feeds, store in dict to cancel if needed
         self.loops = {}
         for feed in self.feeds:
@@ -61,59 +60,41 @@ class DealWatcher(commands.Cog):
         await self.bot.wait_until_ready()
         # is this thread still supposed to be running?
         while not self.loops[feed["name"]].cancelled():
-            # handle feeds with/without HTTP last-modified support differently
-            if feed['good_feed'] is True:
-                await self.good_feed(feed)
-            else:
-                await self.bad_feed(feed)
+            try:
+                await self.check_feed(feed)
+            except Exception:
+                traceback.print_exc()
+                # so that the next poll goes through the same posts again
+                self.bot.feed_fetcher.reset(feed["feed"])
 
             # loop every 60 seconds
             await asyncio.sleep(60)
 
-    # feed watcher for feeds with proper etag support
-
-    async def good_feed(self, feed):
-        # determine args (from cached data)
-        kwargs = dict(modified=feed["prev_data"].modified if hasattr(feed["prev_data"], 'modified')
-                      else None, etag=feed["prev_data"].etag if hasattr(feed["prev_data"], 'modified') else None)
-        # fetch feed data w/ args
-        data = feedparser.parse(
-            feed["feed"], **{k: v for k, v in kwargs.items() if v is not None})
-
-        # has the feed changed?
-        if (data.status != 304):
-            # get newest post date from cached data. any new post will have a date newer than this
-            max_prev_date = max([something["published_parsed"]
-                                 for something in feed["prev_data"].entries])
-            # get new posts
-            new_posts = [
-                post for post in data.entries if post["published_parsed"] > max_prev_date]
-            # if there rae new posts
-            if (len(new_posts) > 0):
-                # check thier tags
-                for post in new_posts:
-                    print(f'NEW GOOD ENTRY: {post.title} {post.link}')
-                await self.check_new_entries(feed, new_posts)
-
-        feed["prev_data"] = data
-
-    # improper etag support
-    async def bad_feed(self, feed):
-        # fetch feed data
-        data = feedparser.parse(feed["feed"])
-        # get newest post date from cached data. any new post will have a date newer than this
-        max_prev_date = max([something["published_parsed"]
-                             for something in feed["prev_data"].entries])
+    async def check_feed(self, feed):
+        # fetch feed data, if it changed since we last checked
+        data = await self.bot.feed_fetcher.fetch(feed["feed"])
+        if data is None:
+            return
+
+        seen = feed["seen"]
+        if not seen.loaded:
+            await seen.load()
+
+        if len(seen) == 0:
+            # first time we're watching this feed, just remember what's there now
+            await seen.add([entry_id(post) for post in data.entries])
+            return
+
         # get new posts
-        new_posts = [
-            post for post in data.entries if post["published_parsed"] > max_prev_date]
+        new_posts = [post for post in data.entries if entry_id(post) not in seen]
         # if there rae new posts
         if (len(new_posts) > 0):
             # check thier tags
             for post in new_posts:
-                print(f'NEW BAD ENTRY: {post.title} {post.link}')
+                print(f'NEW ENTRY: {post.title} {post.link}')
+            # mark them as seen first, so that a failure posting them doesn't post them twice
+            await seen.add([entry_id(post) for post in new_posts])
             await self.check_new_entries(feed, new_posts)
-        feed["prev_data"] = data
 
     async def check_new_entries(self, feed, entries):
         # loop through new entries to see if tags contain one that we want
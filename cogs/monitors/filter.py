@@ -1,9 +1,8 @@
-import string
 import traceback
 
 import discord
+from cogs.utils.normalize import normalize
 from discord.ext import commands
-from fold_to_ascii import fold
 
 
 class FilterMonitor(commands.Cog):
@@ -39,19 +38,13 @@ class FilterMonitor(commands.Cog):
         guild = self.bot.settings.guild()
         nick = member.display_name
 
-        symbols = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
-                   u"abBrdeex3nnKnmHonpcTyoxu4wwbbbeoRABBrDEEX3NNKNMHONPCTyOXU4WWbbbEOR")
+        normalized = normalize(nick)
 
-        tr = {ord(a): ord(b) for a, b in zip(*symbols)}
-
-        folded_message = fold(nick.translate(tr).lower()).lower()
-        folded_without_spaces = "".join(folded_message.split())
-        folded_without_spaces_and_punctuation = folded_without_spaces.translate(str.maketrans('', '', string.punctuation))
-
-        if folded_message:
+        if normalized.folded:
+            level = self.bot.settings.permissions.level(member.guild, member)
             for word in guild.filter_words:
-                if not self.bot.settings.permissions.hasAtLeast(member.guild, member, word.bypass):
-                    if (word.word.lower() in folded_message or word.word.lower() in folded_without_spaces_and_punctuation):
+                if word.bypass > level:
+                    if (word.word.lower() in normalized.folded or word.word.lower() in normalized.without_punctuation):
                         await member.edit(nick="change name pls", reason=f"filter triggered ({nick})")
 
    
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 
 import cogs.utils.context as context
@@ -6,115 +7,268 @@ import humanize
 import pytimeparse
 
 
+class OpenReport:
+    """A report message that is still waiting for a moderator. Further reports for the
+    same user within the coalescing window are merged into it instead of sent separately.
+    """
+
+    def __init__(self, user, kind):
+        self.user = user
+        self.kind = kind
+        self.message = None
+        self.embed = None
+        self.title = None
+        self.hits = 1
+        self.last_hit = datetime.datetime.now()
+        # set once the report message was sent (or sending it failed)
+        self.ready = asyncio.Event()
+        self.edit_task = None
+        # index of the "Latest message" embed field, once there is one
+        self.latest_field = None
+
+
 class Report:
     def __init__(self, bot):
         self.bot = bot
+        # report message ID -> "NOT TERMINATED" or "TERMINATE", for reports waiting on a reaction
         self.pending_tasks = {}
-    
+        # (user ID, kind of report) -> OpenReport
+        self.open_reports = {}
+        # merge reports for the same user that are less than this many seconds apart
+        self.coalesce_window = 60
+        # at most this many reports wait for reactions, older ones stop listening
+        self.max_pending = 25
+
     async def report(self, msg, user, word, invite=None):
-        channel = msg.guild.get_channel(self.bot.settings.guild().channel_reports)
-        ping_string = await self.prepare_ping_string(msg)
-        embed = await self.prepare_embed(user, msg, word)
+        if await self.coalesce(msg, user, "filter", word=word):
+            return
 
-        if invite:
-            report_msg = await channel.send(f"{ping_string}\nMessage contained invite: {invite}", embed=embed)
-        else:
-            report_msg = await channel.send(ping_string, embed=embed)
-        report_reactions = ['✅', '🆔', '🧹']
-
-        ctx = await self.bot.get_context(report_msg, cls=context.Context)
-        prompt_data = context.PromptDataReaction(report_msg, report_reactions)
-        
-        while True:
-            self.pending_tasks[report_msg.id] = "NOT TERMINATED"
-            reaction, reactor = await ctx.prompt_reaction(prompt_data)
-            if reaction == "TERMINATE":
-                return
-
-            if not self.bot.settings.permissions.hasAtLeast(user.guild, user, 2) or reaction not in report_reactions:
-                await report_msg.remove_reaction(reaction, reactor)
-        
-            if reaction == '✅':
-                try:
-                    await report_msg.delete()
-                except Exception:
-                    pass
-                return
-            elif reaction == '🆔':
-                await channel.send(user.id)
-            elif reaction == '🧹':
-                await channel.purge(limit=100)
-                return
+        open_report = self.open_report(user, "filter")
+        report_msg = None
+        try:
+            channel = msg.guild.get_channel(self.bot.settings.guild().channel_reports)
+            ping_string = await self.prepare_ping_string(msg)
+            embed = await self.prepare_embed(user, msg, word)
 
-    async def report_spam(self, msg, user, title):
-        channel = msg.guild.get_channel(self.bot.settings.guild().channel_reports)
-        ping_string = await self.prepare_ping_string(msg)    
-        
-        embed = await self.prepare_embed(user, msg, title=title)
-        embed.set_footer(text="✅ to pardon, 💀 to ban, ⚠️ to temp mute.")
-        
-        report_msg = await channel.send(ping_string, embed=embed)
-        report_reactions = ['✅', '💀', '⚠️']
-
-        ctx = await self.bot.get_context(report_msg, cls=context.Context)
-        prompt_data = context.PromptDataReaction(report_msg, report_reactions)
-        
-        while True:
-            self.pending_tasks[report_msg.id] = "NOT TERMINATED"
-            reaction, reactor = await ctx.prompt_reaction(prompt_data)
-            if reaction == "TERMINATE":
-                return            
+            if invite:
+                report_msg = await channel.send(f"{ping_string}\nMessage contained invite: {invite}", embed=embed)
+            else:
+                report_msg = await channel.send(ping_string, embed=embed)
+            report_reactions = ['✅', '🆔', '🧹']
+
+            open_report.message, open_report.embed, open_report.title = report_msg, embed, embed.title
+            open_report.ready.set()
+            self.track(report_msg)
+
+            ctx = await self.bot.get_context(report_msg, cls=context.Context)
+            prompt_data = context.PromptDataReaction(report_msg, report_reactions)
             
-            if not self.bot.settings.permissions.hasAtLeast(user.guild, user, 2) or reaction not in report_reactions:
-                await report_msg.remove_reaction(reaction, reactor)
-                
-            if reaction == '✅':
-                ctx.author = ctx.message.author = reactor
-                unmute = self.bot.get_command("unmute")
-                if unmute is not None:
-                    try:
-                        await unmute(ctx=ctx, user=user, reason="Reviewed by a moderator.")
-                    except Exception:
-                        pass
-                    await report_msg.delete()
-                else:
-                    await ctx.send_warning("I wasn't able to unmute them.")
-                return
+            while True:
+                reaction, reactor = await ctx.prompt_reaction(prompt_data)
+                if reaction == "TERMINATE" or self.pending_tasks.get(report_msg.id) == "TERMINATE":
+                    await self.terminated(report_msg)
+                    return
+
+                if not self.bot.settings.permissions.hasAtLeast(user.guild, user, 2) or reaction not in report_reactions:
+                    await report_msg.remove_reaction(reaction, reactor)
             
-            elif reaction == '💀':
-                ctx.author = ctx.message.author = reactor
-                ban = self.bot.get_command("ban")
-                if ban is not None:
+                if reaction == '✅':
                     try:
-                        await ban(ctx=ctx, user=user, reason="Ping spam")
+                        await report_msg.delete()
                     except Exception:
                         pass
-                    await report_msg.delete()
-                else:
-                    await ctx.send_warning("I wasn't able to ban them.")
-                return
-            elif reaction == '⚠️':            
-                ctx.author = ctx.message.author = reactor
-                now = datetime.datetime.now()
-                delta = await self.prompt_time(ctx)
-                if delta is None:
-                    continue
+                    return
+                elif reaction == '🆔':
+                    await channel.send(user.id)
+                elif reaction == '🧹':
+                    await channel.purge(limit=100)
+                    return
+        finally:
+            self.close_report(open_report, report_msg)
+
+    async def report_spam(self, msg, user, title):
+        if await self.coalesce(msg, user, "spam"):
+            return
+
+        open_report = self.open_report(user, "spam")
+        report_msg = None
+        try:
+            channel = msg.guild.get_channel(self.bot.settings.guild().channel_reports)
+            ping_string = await self.prepare_ping_string(msg)    
+            
+            embed = await self.prepare_embed(user, msg, title=title)
+            embed.set_footer(text="✅ to pardon, 💀 to ban, ⚠️ to temp mute.")
+            
+            report_msg = await channel.send(ping_string, embed=embed)
+            report_reactions = ['✅', '💀', '⚠️']
+
+            open_report.message, open_report.embed, open_report.title = report_msg, embed, title
+            open_report.ready.set()
+            self.track(report_msg)
+
+            ctx = await self.bot.get_context(report_msg, cls=context.Context)
+            prompt_data = context.PromptDataReaction(report_msg, report_reactions)
+            
+            while True:
+                reaction, reactor = await ctx.prompt_reaction(prompt_data)
+                if reaction == "TERMINATE" or self.pending_tasks.get(report_msg.id) == "TERMINATE":
+                    await self.terminated(report_msg)
+                    return            
                 
-                try:
-                    time = now + datetime.timedelta(seconds=delta)
-                    ctx.tasks.schedule_unmute(user.id, time)
+                if not self.bot.settings.permissions.hasAtLeast(user.guild, user, 2) or reaction not in report_reactions:
+                    await report_msg.remove_reaction(reaction, reactor)
                     
-                    await ctx.send_success(title="Done!", description=f"{user.mention} was muted for {humanize.naturaldelta(time - now)}.", delete_after=5)
-                    await report_msg.delete()
+                if reaction == '✅':
+                    ctx.author = ctx.message.author = reactor
+                    unmute = self.bot.get_command("unmute")
+                    if unmute is not None:
+                        try:
+                            await unmute(ctx=ctx, user=user, reason="Reviewed by a moderator.")
+                        except Exception:
+                            pass
+                        await report_msg.delete()
+                    else:
+                        await ctx.send_warning("I wasn't able to unmute them.")
+                    return
+                
+                elif reaction == '💀':
+                    ctx.author = ctx.message.author = reactor
+                    ban = self.bot.get_command("ban")
+                    if ban is not None:
+                        try:
+                            await ban(ctx=ctx, user=user, reason="Ping spam")
+                        except Exception:
+                            pass
+                        await report_msg.delete()
+                    else:
+                        await ctx.send_warning("I wasn't able to ban them.")
+                    return
+                elif reaction == '⚠️':            
+                    ctx.author = ctx.message.author = reactor
+                    now = datetime.datetime.now()
+                    delta = await self.prompt_time(ctx)
+                    if delta is None:
+                        continue
                     
                     try:
-                        await user.send(embed=discord.Embed(title="Ping spam unmute", description=f"A moderator has reviewed your ping spam report. You will be unmuted in {humanize.naturaldelta(time - now)}.", color=discord.Color.orange()))
+                        time = now + datetime.timedelta(seconds=delta)
+                        ctx.tasks.schedule_unmute(user.id, time)
+                        
+                        await ctx.send_success(title="Done!", description=f"{user.mention} was muted for {humanize.naturaldelta(time - now)}.", delete_after=5)
+                        await report_msg.delete()
+                        
+                        try:
+                            await user.send(embed=discord.Embed(title="Ping spam unmute", description=f"A moderator has reviewed your ping spam report. You will be unmuted in {humanize.naturaldelta(time - now)}.", color=discord.Color.orange()))
+                        except Exception:
+                            pass
+                        
+                        return
                     except Exception:
-                        pass
-                    
-                    return
-                except Exception:
-                    return
+                        return
+        finally:
+            self.close_report(open_report, report_msg)
+
+    def open_report(self, user, kind) -> OpenReport:
+        """Register a new report for a user, that later reports can be merged into."""
+
+        open_report = self.open_reports[(user.id, kind)] = OpenReport(user, kind)
+        return open_report
+
+    def close_report(self, open_report, report_msg) -> None:
+        """Clean up after a report is resolved (or failed to send)."""
+
+        # let anyone waiting to merge into this report send their own instead
+        open_report.ready.set()
+        if self.open_reports.get((open_report.user.id, open_report.kind)) is open_report:
+            del self.open_reports[(open_report.user.id, open_report.kind)]
+        if open_report.edit_task is not None:
+            open_report.edit_task.cancel()
+        if report_msg is not None:
+            self.pending_tasks.pop(report_msg.id, None)
+
+    def track(self, report_msg) -> None:
+        """Start tracking a report that waits for reactions. If there are too many of
+        those already, the oldest ones are terminated.
+        """
+
+        waiting = [id for id, state in self.pending_tasks.items() if state != "TERMINATE"]
+        for id in waiting[:max(0, len(waiting) - self.max_pending + 1)]:
+            self.pending_tasks[id] = "TERMINATE"
+
+        self.pending_tasks[report_msg.id] = "NOT TERMINATED"
+
+    async def terminated(self, report_msg) -> None:
+        # nobody is listening for reactions on this report anymore
+        try:
+            await report_msg.clear_reactions()
+        except Exception:
+            pass
+
+    async def coalesce(self, msg, user, kind, word=None) -> bool:
+        """Merge a report into the open report for the same user, if there is a recent one.
+
+        Parameters
+        ----------
+        msg : discord.Message
+            The message being reported
+        user : discord.Member
+            The author of the message
+        kind : str
+            "filter" or "spam", only reports of the same kind are merged
+        word : str, optional
+            The filtered word, by default None
+
+        Returns
+        -------
+        bool
+            True if the report was merged, False if a new report should be sent.
+        """
+
+        open_report = self.open_reports.get((user.id, kind))
+        if open_report is None:
+            return False
+
+        now = datetime.datetime.now()
+        if (now - open_report.last_hit).total_seconds() > self.coalesce_window:
+            return False
+
+        # count the hit right away, so that concurrent reports see the updated time
+        open_report.hits += 1
+        open_report.last_hit = now
+
+        await open_report.ready.wait()
+        if open_report.message is None or self.open_reports.get((user.id, kind)) is not open_report:
+            # the report failed to send or was resolved while we were waiting
+            return False
+
+        embed = open_report.embed
+        embed.title = f"{open_report.title} ({open_report.hits} hits)"
+
+        content = msg.content
+        if len(content) > 400:
+            content = content[0:400] + "..."
+        value = discord.utils.escape_markdown(content) + f"\n\n[Link to message]({msg.jump_url})"
+        if word is not None:
+            value += f" | Filtered word: **{word}**"
+
+        if open_report.latest_field is None:
+            open_report.latest_field = len(embed.fields)
+            embed.add_field(name="Latest message", value=value, inline=False)
+        else:
+            embed.set_field_at(open_report.latest_field, name="Latest message", value=value, inline=False)
+
+        # edits are debounced, a burst of hits results in a single edit
+        if open_report.edit_task is None or open_report.edit_task.done():
+            open_report.edit_task = self.bot.loop.create_task(self.edit_report(open_report))
+
+        return True
+
+    async def edit_report(self, open_report) -> None:
+        await asyncio.sleep(1)
+        try:
+            await open_report.message.edit(embed=open_report.embed)
+        except discord.NotFound:
+            pass
 
     async def prompt_time(self, ctx):
         prompt_data = context.PromptData(value_name="duration", 
@@ -143,9 +297,10 @@ class Report:
         rd = await self.bot.settings.rundown(user.id)
         rd_text = ""
         for r in rd:
+            punishment = r.punishment
             if r._type == "WARN":
-                r.punishment += " points"
-            rd_text += f"**{r._type}** - {r.punishment} - {r.reason} - {humanize.naturaltime(datetime.datetime.now() - r.date)}\n"
+                punishment += " points"
+            rd_text += f"**{r._type}** - {punishment} - {r.reason} - {humanize.naturaltime(datetime.datetime.now() - r.date)}\n"
 
         embed = discord.Embed(title=title)
         embed.color = discord.Color.red()
@@ -192,9 +347,9 @@ class Report:
     async def prepare_ping_string(self, msg):
         ping_string = ""    
         role = msg.guild.get_role(self.bot.settings.guild().role_moderator)
+        offline_ping = await self.bot.settings.offline_ping_users()
         for member in role.members:
-            offline_ping = (await self.bot.settings.user(member.id)).offline_report_ping
-            if member.status == discord.Status.online or offline_ping:
+            if member.status == discord.Status.online or member.id in offline_ping:
                 ping_string += f"{member.mention} "
 
         return ping_string
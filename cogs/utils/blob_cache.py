@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+"""
+A size-aware LRU cache for binary blobs (i.e tag images from GridFS), bounded by the
+total number of bytes held instead of the number of entries.
+"""
+
+
+class BlobCache:
+    """LRU cache mapping a key to a blob of bytes (and the blob's content type)."""
+
+    def __init__(self, max_bytes: int):
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Total size of the blobs to keep, blobs bigger than this are never cached
+        """
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._blobs = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def get(self, key):
+        """Look up a blob.
+
+        Returns
+        -------
+        tuple
+            (bytes, content type), or None if the blob isn't cached.
+        """
+
+        blob = self._blobs.get(key)
+        if blob is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._blobs.move_to_end(key)
+        return blob
+
+    def put(self, key, data: bytes, content_type: str = None) -> None:
+        """Add a blob, evicting the least recently used ones until it fits."""
+
+        if len(data) > self.max_bytes:
+            return
+
+        self.pop(key)
+        self._blobs[key] = (data, content_type)
+        self.size += len(data)
+
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self._blobs.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key) -> None:
+        blob = self._blobs.pop(key, None)
+        if blob is not None:
+            self.size -= len(blob[0])
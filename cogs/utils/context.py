@@ -96,7 +96,7 @@ class Context(commands.Context):
         if info.timeout is None:
             while True:
                 try:
-                    reaction, reactor = await self.bot.wait_for('reaction_add', timeout=300.0, check=wait_check)
+                    reaction, reactor = await self.bot.wait_for('reaction_add', timeout=30.0, check=wait_check)
                     if reaction is not None:
                         return str(reaction.emoji), reactor    
                 except asyncio.TimeoutError:
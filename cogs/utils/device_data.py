@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import traceback
+
+import aiohttp
+from cogs.utils.search_index import SearchIndex
+
+"""
+The cros-updates device dataset used by the board/device commands. It's downloaded once
+and then refreshed in the background with conditional requests, so the commands look
+boards up in memory instead of downloading and scanning the whole file every time. The
+last copy is kept on disk, so the commands keep working (with slightly stale data) while
+GitHub is unreachable, including right after a restart.
+"""
+
+
+class DeviceData:
+    url = "https://raw.githubusercontent.com/skylartaylor/cros-updates/master/src/data/cros-updates.json"
+    # seconds between attempts while there's no dataset at all, doubled after every failure
+    min_retry_interval = 5
+    max_retry_interval = 300
+
+    def __init__(self, bot, path: str = None, refresh_interval: int = 3600, timeout: int = 30):
+        """Initialize the dataset and start refreshing it in the background.
+
+        Parameters
+        ----------
+        bot : discord.Client
+            The bot, for its event loop
+        path : str, optional
+            File to keep the last copy of the dataset in, by default `CHROMEY_DEVICE_DATA_PATH` or cros-updates.json
+        refresh_interval : int, optional
+            Seconds between refreshes, by default 3600
+        timeout : int, optional
+            Timeout for a single request in seconds, by default 30
+        """
+
+        self.bot = bot
+        self.path = path or os.environ.get("CHROMEY_DEVICE_DATA_PATH", "cros-updates.json")
+        self.refresh_interval = refresh_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self.devices = []
+        # codename -> device
+        self.by_codename = {}
+        # brand names of the devices (each one separately), by codename
+        self.index = SearchIndex([])
+        self.etag = None
+        self.last_modified = None
+
+        # set once we have a dataset, from disk or from GitHub, or know we can't get one
+        self._ready = asyncio.Event()
+        self._task = bot.loop.create_task(self._refresh_loop())
+
+    def close(self) -> None:
+        self._task.cancel()
+
+    async def wait_ready(self) -> bool:
+        """Wait for the first load of the dataset, if it's still in progress.
+
+        Returns
+        -------
+        bool
+            Whether there is a dataset to look things up in.
+        """
+
+        await self._ready.wait()
+        return bool(self.devices)
+
+    def get(self, codename: str):
+        """Look up a device by board name.
+
+        Parameters
+        ----------
+        codename : str
+            Lowercase board name, e.g. edgar
+
+        Returns
+        -------
+        dict
+            The device's record in the dataset, or None if there is no such board.
+        """
+
+        return self.by_codename.get(codename)
+
+    def search(self, term: str) -> list:
+        """Find devices by brand name.
+
+        Parameters
+        ----------
+        term : str
+            Search term, matched against the words in the brand names
+
+        Returns
+        -------
+        list
+            (codename, brand names) for each matching device, best match first
+        """
+
+        return [(codename, self.by_codename[codename]["Brand names"]) for codename in self.index.search(term)]
+
+    def _set(self, devices: list) -> None:
+        self.devices = devices
+        self.by_codename = {device["Codename"]: device for device in devices if "Codename" in device}
+        self.index = SearchIndex((device["Codename"], name)
+                                 for device in devices if device.get("Brand names") and "Codename" in device
+                                 for name in device["Brand names"].split(","))
+
+    async def _refresh_loop(self) -> None:
+        await self._load()
+        retry = self.min_retry_interval
+        while True:
+            try:
+                await self.refresh()
+            finally:
+                # even if it failed, don't keep the commands waiting
+                self._ready.set()
+
+            if self.devices:
+                retry = self.min_retry_interval
+                await asyncio.sleep(self.refresh_interval)
+            else:
+                # the commands can't do anything without a dataset, so try again soon
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, self.max_retry_interval)
+
+    async def _load(self) -> None:
+        def read():
+            with open(self.path) as f:
+                return json.load(f)
+
+        try:
+            saved = await self.bot.loop.run_in_executor(None, read)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            print(f"Couldn't read saved device data from {self.path}")
+            traceback.print_exc()
+            return
+
+        self.etag = saved.get("etag")
+        self.last_modified = saved.get("last_modified")
+        self._set(saved.get("devices", []))
+        if self.devices:
+            self._ready.set()
+
+    async def _save(self) -> None:
+        saved = {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "devices": self.devices
+        }
+
+        def write():
+            # written to a temporary file first, so a crash never leaves a half written file behind
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(saved, f)
+            os.replace(tmp, self.path)
+
+        try:
+            await self.bot.loop.run_in_executor(None, write)
+        except OSError:
+            print(f"Couldn't save device data to {self.path}")
+            traceback.print_exc()
+
+    async def refresh(self) -> bool:
+        """Download the dataset if it changed since the last download.
+
+        Returns
+        -------
+        bool
+            Whether the dataset was updated.
+        """
+
+        headers = {}
+        # without a dataset in memory, always download it in full
+        if self.devices:
+            if self.etag is not None:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified is not None:
+                headers["If-Modified-Since"] = self.last_modified
+
+        try:
+            async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                async with session.get(self.url, headers=headers) as response:
+                    if response.status == 304:
+                        return False
+                    response.raise_for_status()
+                    body = await response.read()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+            devices = json.loads(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            print("Couldn't refresh device data")
+            traceback.print_exc()
+            return False
+
+        self.etag = etag
+        self.last_modified = last_modified
+        self._set(devices)
+        await self._save()
+        return True
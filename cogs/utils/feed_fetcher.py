@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import traceback
+
+import aiohttp
+import feedparser
+
+"""
+Shared fetcher for the RSS/Atom feeds the watchers poll. Feeds are downloaded with aiohttp
+instead of `feedparser.parse(url)`, which does a blocking HTTP request on the event loop.
+Requests are conditional (ETag/Last-Modified), a body identical to the last one isn't
+parsed again, and parsing itself runs in an executor.
+"""
+
+
+class FeedState:
+    """What we remember about a feed between polls."""
+
+    __slots__ = ("etag", "last_modified", "digest")
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+
+
+class FeedFetcher:
+    def __init__(self, bot, timeout: int = 30):
+        """Initialize the fetcher.
+
+        Parameters
+        ----------
+        bot : discord.Client
+            The bot, for its event loop
+        timeout : int, optional
+            Timeout for a single request in seconds, by default 30
+        """
+
+        self.bot = bot
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        # feed URL -> FeedState
+        self._feeds = {}
+
+    async def session(self) -> aiohttp.ClientSession:
+        # created on first use, a ClientSession has to be created from within the event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def reset(self, url: str) -> None:
+        """Forget what we know about a feed, so that the next `fetch()` returns it even if
+        it didn't change (i.e when the last poll's posts couldn't be handled).
+
+        Parameters
+        ----------
+        url : str
+            URL of the feed
+        """
+
+        self._feeds.pop(url, None)
+
+    async def fetch(self, url: str):
+        """Poll a feed.
+
+        Parameters
+        ----------
+        url : str
+            URL of the feed
+
+        Returns
+        -------
+        feedparser.FeedParserDict
+            The parsed feed, or None if it didn't change since the last poll
+            (or couldn't be fetched).
+        """
+
+        state = self._feeds.setdefault(url, FeedState())
+
+        headers = {}
+        if state.etag is not None:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified is not None:
+            headers["If-Modified-Since"] = state.last_modified
+
+        try:
+            session = await self.session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                response.raise_for_status()
+
+                body = await response.read()
+                response_headers = {k.lower(): v for k, v in response.headers.items()}
+                response_headers["content-location"] = str(response.url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            print(f"Couldn't fetch feed {url}")
+            traceback.print_exc()
+            return None
+
+        state.etag = response.headers.get("ETag")
+        state.last_modified = response.headers.get("Last-Modified")
+
+        # plenty of feeds don't support conditional requests, so also check if the content changed
+        digest = hashlib.sha1(body).digest()
+        if digest == state.digest:
+            return None
+
+        data = await self.bot.loop.run_in_executor(None, lambda: feedparser.parse(body, response_headers=response_headers))
+        state.digest = digest
+        return data
@@ -0,0 +1,111 @@
+import asyncio
+
+import discord
+from expiringdict import ExpiringDict
+
+"""
+A cache in front of `fetch_invite` for the invite filter. Spam waves tend to repeat the
+same invite over and over, so instead of one API call per message we remember which
+guild each invite code points to (or that it doesn't exist) for a while.
+"""
+
+_MISSING = object()
+
+
+class InviteCache:
+    """Maps invite codes to the ID of the guild they point to. Invites that don't exist
+    are cached too (as None). Concurrent lookups for the same code share a single request.
+    """
+
+    def __init__(self, bot: discord.Client, max_len: int = 1000, max_age_seconds: int = 1800):
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        bot : discord.Client
+            Client used to fetch the invites
+        max_len : int, optional
+            Maximum number of invite codes to remember, by default 1000
+        max_age_seconds : int, optional
+            How long to remember an invite code for, by default 1800
+        """
+
+        self.bot = bot
+        self._cache = ExpiringDict(max_len=max_len, max_age_seconds=max_age_seconds)
+        # invite code -> task fetching that invite, for lookups in flight
+        self._pending = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def resolve(self, invite: str):
+        """Look up the guild an invite points to.
+
+        Parameters
+        ----------
+        invite : str
+            The invite URL or code
+
+        Returns
+        -------
+        int
+            ID of the guild the invite points to, or None if the invite doesn't exist.
+        """
+
+        code = discord.utils.resolve_invite(invite)
+
+        guild_id = self._cache.get(code, _MISSING)
+        if guild_id is not _MISSING:
+            self.hits += 1
+            return guild_id
+
+        task = self._pending.get(code)
+        if task is None:
+            self.misses += 1
+            task = self._pending[code] = self.bot.loop.create_task(self._fetch(code))
+            task.add_done_callback(lambda _: self._pending.pop(code, None))
+        else:
+            self.hits += 1
+
+        # shielded, so that one cancelled waiter doesn't cancel the lookup for everyone else
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, invites: list) -> list:
+        """Look up multiple invites concurrently, see `resolve()`.
+
+        Parameters
+        ----------
+        invites : list
+            The invite URLs or codes
+
+        Returns
+        -------
+        list
+            The guild IDs (or None) in the same order as `invites`.
+        """
+
+        return await asyncio.gather(*[self.resolve(invite) for invite in invites])
+
+    async def _fetch(self, code: str):
+        try:
+            invite = await self.bot.fetch_invite(code)
+        except discord.errors.NotFound:
+            self._cache[code] = None
+            return None
+
+        id = None
+        if isinstance(invite, discord.Invite):
+            if invite.guild is not None:
+                id = invite.guild.id
+            else:
+                id = 123
+        elif isinstance(invite, discord.PartialInviteGuild) or isinstance(invite, discord.PartialInviteChannel):
+            id = invite.id
+
+        self._cache[code] = id
+        return id
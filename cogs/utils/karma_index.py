@@ -0,0 +1,73 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+
+"""
+In-memory ordering of users by karma, for the leaderboard and `!karma get` ranks.
+Kept as a sorted array: lookups are a binary search, and an update moves a single
+entry instead of the database counting every user with more karma.
+"""
+
+
+class KarmaIndex:
+    """All users sorted by karma (highest first, ties broken by highest ID first, like
+    the leaderboard query it replaces).
+    """
+
+    def __init__(self):
+        # sorted list of (-karma, -user ID), so that iterating goes from the top down
+        self._keys = []
+        # user ID -> karma
+        self._karma = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._karma
+
+    def load(self, users) -> None:
+        """Replace the contents of the index.
+
+        Parameters
+        ----------
+        users : iterable
+            (user ID, karma) pairs
+        """
+
+        self._karma = dict(users)
+        self._keys = sorted((-karma, -id) for id, karma in self._karma.items())
+
+    def update(self, id: int, karma: int) -> None:
+        """Set the karma of a user, adding them to the index if they aren't in it yet.
+
+        Parameters
+        ----------
+        id : int
+            ID of the user
+        karma : int
+            Their new karma
+        """
+
+        old = self._karma.get(id)
+        if old == karma:
+            return
+
+        if old is not None:
+            i = bisect_left(self._keys, (-old, -id))
+            del self._keys[i]
+
+        self._karma[id] = karma
+        insort(self._keys, (-karma, -id))
+
+    def rank(self, karma: int) -> int:
+        """The number of users with at least `karma` karma, i.e the leaderboard rank
+        of a user with that much karma.
+        """
+
+        return bisect_right(self._keys, (-karma, math.inf))
+
+    def __iter__(self):
+        """(user ID, karma) pairs from the top of the leaderboard down."""
+
+        for karma, id in self._keys:
+            yield -id, -karma
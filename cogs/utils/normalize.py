@@ -0,0 +1,114 @@
+import string
+
+from expiringdict import ExpiringDict
+from fold_to_ascii import fold
+
+"""
+Text normalization shared by the word filter, the nickname filter and the raid phrase
+filter. The translation tables are built once at import, and the normalized forms of a
+message are memoized on the message ID so that every filter in the same event reuses them.
+"""
+
+# maps Cyrillic lookalike characters to the latin characters they are used to imitate
+_SYMBOLS = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
+            u"abBrdeex3nnKnmHonpcTyoxu4wwbbbeoRABBrDEEX3NNKNMHONPCTyOXU4WWbbbEOR")
+
+CYRILLIC_TABLE = {ord(a): ord(b) for a, b in zip(*_SYMBOLS)}
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+# normalized forms of recently seen messages, keyed by message ID
+_message_cache = ExpiringDict(max_len=1000, max_age_seconds=60)
+
+
+class NormalizedText:
+    """The forms of a piece of text that the filters match against."""
+
+    __slots__ = ("content", "folded", "without_spaces", "without_punctuation")
+
+    def __init__(self, content: str):
+        self.content = content
+        self.folded = fold(content.translate(CYRILLIC_TABLE).lower()).lower()
+        self.without_spaces = "".join(self.folded.split())
+        self.without_punctuation = self.without_spaces.translate(PUNCTUATION_TABLE)
+
+
+def normalize(text: str) -> NormalizedText:
+    """Normalize a piece of text (i.e a nickname) for filtering.
+
+    Parameters
+    ----------
+    text : str
+        The text to normalize
+
+    Returns
+    -------
+    NormalizedText
+        The folded, no-space and no-punctuation forms of the text.
+    """
+
+    return NormalizedText(text)
+
+
+def normalize_message(message) -> NormalizedText:
+    """Normalize the content of a message for filtering, reusing the result if the same
+    message was already normalized. An edited message is normalized again.
+
+    Parameters
+    ----------
+    message : discord.Message
+        The message to normalize
+
+    Returns
+    -------
+    NormalizedText
+        The folded, no-space and no-punctuation forms of the message content.
+    """
+
+    normalized = _message_cache.get(message.id)
+    if normalized is None or normalized.content != message.content:
+        normalized = NormalizedText(message.content)
+        _message_cache[message.id] = normalized
+
+    return normalized
+
+
+if __name__ == "__main__":
+    # micro-benchmark: per-message cost of normalizing a message for the word filter
+    # and the raid phrase filter, with the old per-call tables vs. the shared pipeline.
+    # run with `python -m cogs.utils.normalize`
+    import random
+    import timeit
+
+    class FakeMessage:
+        def __init__(self, id, content):
+            self.id = id
+            self.content = content
+
+    def legacy(content):
+        symbols = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
+                   u"abBrdeex3nnKnmHonpcTyoxu4wwbbbeoRABBrDEEX3NNKNMHONPCTyOXU4WWbbbEOR")
+        tr = {ord(a): ord(b) for a, b in zip(*symbols)}
+        folded_message = fold(content.translate(tr).lower()).lower()
+        folded_without_spaces = "".join(folded_message.split())
+        folded_without_spaces.translate(str.maketrans('', '', string.punctuation))
+
+    alphabet = string.ascii_letters + string.punctuation + "    абвгдеёжзий"
+    messages = [FakeMessage(i, "".join(random.choice(alphabet) for _ in range(random.randint(10, 300))))
+                for i in range(500)]
+
+    def run_legacy():
+        for message in messages:
+            legacy(message.content)  # word filter
+            legacy(message.content)  # raid phrase filter
+
+    def run_shared():
+        _message_cache.clear()
+        for message in messages:
+            normalize_message(message)  # word filter
+            normalize_message(message)  # raid phrase filter
+
+    rounds = 20
+    before = min(timeit.repeat(run_legacy, number=1, repeat=rounds)) / len(messages)
+    after = min(timeit.repeat(run_shared, number=1, repeat=rounds)) / len(messages)
+    print(f"before: {before * 1e6:.1f}us per message")
+    print(f"after:  {after * 1e6:.1f}us per message ({before / after:.2f}x)")
@@ -0,0 +1,188 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+"""
+A small in-memory full text index for searching short names, like the brand names of
+devices for !device2board. Documents are split into words (tokens), and every distinct word
+is also split into trigrams, so that a query word finds the document words it's equal
+to, the ones it's a prefix of, and ones that are spelled a bit differently.
+
+Run this module to benchmark it against a plain substring scan:
+    python -m cogs.utils.search_index [cros-updates.json]
+"""
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# how much a query word matching a document word counts for, by kind of match
+EXACT = 1.0
+PREFIX = 0.8
+FUZZY = 0.6
+# minimum trigram similarity for a fuzzy match
+MIN_SIMILARITY = 0.4
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall(text.lower())
+
+
+def trigrams(token: str) -> set:
+    # padded, so that short words have trigrams too and the start of a word weighs more
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, documents):
+        """Build the index.
+
+        Parameters
+        ----------
+        documents : iterable
+            (key, text) pairs, `key` is what `search()` returns for a matching document.
+            Keys don't have to be unique, e.g. for a thing with several names
+        """
+
+        self.keys = []
+        # word -> IDs of the documents containing it
+        self.postings = defaultdict(set)
+        # trigram -> words containing it
+        self.trigram_words = defaultdict(set)
+        # word -> number of trigrams in it
+        self.word_trigrams = {}
+
+        for doc_id, (key, text) in enumerate(documents):
+            self.keys.append(key)
+            for token in tokenize(text):
+                self.postings[token].add(doc_id)
+
+        for token in self.postings:
+            grams = trigrams(token)
+            self.word_trigrams[token] = len(grams)
+            for gram in grams:
+                self.trigram_words[gram].add(token)
+
+        # sorted, to find all words starting with a prefix by bisecting
+        self.words = sorted(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _word_matches(self, token: str) -> dict:
+        """Find the words in the index matching a query word.
+
+        Returns
+        -------
+        dict
+            word -> score of the match
+        """
+
+        matches = {}
+
+        # words starting with the query word, including the word itself
+        i = bisect_left(self.words, token)
+        while i < len(self.words) and self.words[i].startswith(token):
+            word = self.words[i]
+            matches[word] = EXACT if word == token else PREFIX
+            i += 1
+
+        # words sharing enough trigrams with the query word, for typos.
+        # too few trigrams in short words for this to mean anything
+        if len(token) >= 3:
+            grams = trigrams(token)
+            shared = defaultdict(int)
+            for gram in grams:
+                for word in self.trigram_words.get(gram, ()):
+                    shared[word] += 1
+
+            for word, count in shared.items():
+                similarity = count / (len(grams) + self.word_trigrams[word] - count)
+                if similarity >= MIN_SIMILARITY and word not in matches:
+                    matches[word] = FUZZY * similarity
+
+        return matches
+
+    def search(self, query: str, limit: int = None) -> list:
+        """Search the index.
+
+        Documents matching every word of the query come first, then (only if there
+        are none) the ones matching the most words. Within those, documents are
+        ranked by how well their words match.
+
+        Parameters
+        ----------
+        query : str
+            The search query
+        limit : int, optional
+            Maximum number of results, by default all of them
+
+        Returns
+        -------
+        list
+            Keys of the matching documents, best match first
+        """
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        # doc ID -> [number of query words matched, score]
+        scores = {}
+        for token in tokens:
+            # best match for this query word, per document
+            best = {}
+            for word, score in self._word_matches(token).items():
+                for doc_id in self.postings[word]:
+                    if score > best.get(doc_id, 0):
+                        best[doc_id] = score
+
+            for doc_id, score in best.items():
+                entry = scores.setdefault(doc_id, [0, 0.0])
+                entry[0] += 1
+                entry[1] += score
+
+        if not scores:
+            return []
+
+        most_matched = max(matched for matched, _ in scores.values())
+        results = [(score, doc_id) for doc_id, (matched, score) in scores.items() if matched == most_matched]
+        # best score first, ties in the order the documents were added
+        results.sort(key=lambda t: (-t[0], t[1]))
+        keys = list(dict.fromkeys(self.keys[doc_id] for _, doc_id in results))
+        if limit is not None:
+            keys = keys[:limit]
+
+        return keys
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    import timeit
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "cros-updates.json"
+    with open(path) as f:
+        devices = json.load(f)
+    # the file saved by DeviceData
+    if isinstance(devices, dict):
+        devices = devices["devices"]
+
+    devices = [device for device in devices if device.get("Brand names") and "Codename" in device]
+    documents = [(device["Codename"], name) for device in devices for name in device["Brand names"].split(",")]
+
+    build = timeit.timeit(lambda: SearchIndex(documents), number=10) / 10
+    index = SearchIndex(documents)
+    print(f"{len(devices)} devices, {len(index)} names, {len(index.words)} distinct words, built in {build * 1000:.2f}ms\n")
+
+    queries = ["acer chromebook 11", "pixelbook", "pixlebook", "asus flip", "hp x360", "lenovo duet", "samsng chromebook plus", "c302"]
+
+    def scan(term):
+        term = term.lower()
+        return list(dict.fromkeys(codename for codename, name in documents if term in name.lower()))
+
+    print(f"{'query':<25} {'scan':>10} {'results':>8} {'index':>10} {'results':>8}")
+    for query in queries:
+        number = 200
+        scan_time = timeit.timeit(lambda: scan(query), number=number) / number
+        index_time = timeit.timeit(lambda: index.search(query), number=number) / number
+        print(f"{query:<25} {scan_time * 1000:8.3f}ms {len(scan(query)):>8} {index_time * 1000:8.3f}ms {len(index.search(query)):>8}")
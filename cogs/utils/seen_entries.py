@@ -0,0 +1,80 @@
+from collections import deque
+
+from data.seenentries import SeenEntries
+
+"""
+Persistent record of the feed entries a watcher has already handled, so that new posts
+are found by ID instead of by comparing dates with the previous fetch, and a restart
+doesn't post (or miss) anything.
+"""
+
+
+def entry_id(entry) -> str:
+    """The ID of a feed entry, its GUID if it has one, otherwise its link."""
+
+    return entry.get("id") or entry.get("link")
+
+
+class SeenEntryStore:
+    """The IDs of the most recent `max_len` entries seen in a feed, kept in memory
+    and in the database.
+    """
+
+    def __init__(self, settings, feed: str, max_len: int = 500):
+        """Initialize the store. Nothing is loaded until `load()` is called.
+
+        Parameters
+        ----------
+        settings : Settings
+            Used to run database calls off the event loop
+        feed : str
+            URL of the feed
+        max_len : int, optional
+            Number of entry IDs to remember, by default 500
+        """
+
+        self.settings = settings
+        self.feed = feed
+        self.max_len = max_len
+        self.loaded = False
+        self._seen = set()
+        self._order = deque()
+
+    def __contains__(self, guid: str) -> bool:
+        return guid in self._seen
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    async def load(self) -> None:
+        document = await self.settings.run_db(lambda: SeenEntries.objects(_id=self.feed).first())
+        guids = document.guids if document is not None else []
+        self._order = deque(guids, maxlen=self.max_len)
+        self._seen = set(self._order)
+        self.loaded = True
+
+    async def add(self, guids: list) -> None:
+        """Mark entries as seen.
+
+        Parameters
+        ----------
+        guids : list
+            IDs of the entries, see `entry_id()`
+        """
+
+        guids = [guid for guid in dict.fromkeys(guids) if guid not in self._seen]
+        if not guids:
+            return
+
+        # append to the list in the database, keeping only the newest max_len. Written
+        # first, so that if this fails, the entries still count as new on the next poll
+        await self.settings.run_db(lambda: SeenEntries._get_collection().update_one(
+            {"_id": self.feed},
+            {"$push": {"guids": {"$each": guids, "$slice": -self.max_len}}},
+            upsert=True))
+
+        for guid in guids:
+            if len(self._order) == self.max_len:
+                self._seen.discard(self._order[0])
+            self._order.append(guid)
+            self._seen.add(guid)
@@ -1,16 +1,27 @@
+import asyncio
+import functools
 import os
-from collections import Counter
+import traceback
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import discord
 import mongoengine
+from expiringdict import ExpiringDict
 from cogs.utils.tasks import Tasks
+from cogs.utils.blob_cache import BlobCache
+from cogs.utils.karma_index import KarmaIndex
+from cogs.utils.word_filter import CompiledFilter
 from data.case import Case
-from data.cases import Cases
 from data.filterword import FilterWord
 from data.guild import Guild
+from data.karmaevent import KarmaEvent
+from data.modstats import ModStats, reason_key
 from data.tag import Tag
 from data.user import User
 from discord.ext import commands
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, UpdateOne
 
 
 class Settings(commands.Cog):
@@ -34,19 +45,128 @@ class Settings(commands.Cog):
             Instance of discord.Client, passed in when the Cog is initialized.
         """
 
-        mongoengine.register_connection(alias="default", name="chromey")
+        # CHROMEY_MONGO_HOST can point to another mongod, or to "mongomock://localhost" for testing
+        mongoengine.register_connection(alias="default", name="chromey", host=os.environ.get("CHROMEY_MONGO_HOST", "localhost"))
         self.tasks = None
         self.bot = bot
         self.guild_id = int(os.environ.get("CHROMEY_MAINGUILD"))
+
+        # mongoengine is blocking, so database calls are run on this bounded pool
+        # instead of on the event loop, see `run_db()`
+        self.db_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("CHROMEY_DB_WORKERS", 8)),
+                                              thread_name_prefix="database")
+
+        # in-memory snapshot of the main Guild document, see `guild()`
+        self._guild = None
+        self._guild_version = 0
+        self.guild_cache_hits = 0
+        self.guild_cache_misses = 0
+        # filter word lists compiled into automatons, maps a Guild field to a tuple of
+        # (CompiledFilter, the Guild document it was compiled from), see `word_filter()`
+        self._compiled_filters = {}
+
+        # LRU cache of User documents, see `user()`
+        self._users = OrderedDict()
+        self.user_cache_size = int(os.environ.get("CHROMEY_USER_CACHE_SIZE", 5000))
+        # user ID -> fields changed since the last flush, written in one batch by `flush_users()`
+        self._user_dirty = {}
+        # (Guild document, (name, args) -> Tag, ID -> Tag), see `get_tag()`
+        self._tag_index = None
+        # tag ID -> uses not written yet / written since the cached Guild document was loaded
+        self._tag_uses = Counter()
+        self._tag_uses_flushed = Counter()
+        # tag images from GridFS, see `tag_image()`
+        self._tag_images = BlobCache(max_bytes=int(os.environ.get("CHROMEY_TAG_IMAGE_CACHE_MB", 64)) * 1024 * 1024)
+        # grid ID -> task reading that image, for reads in flight
+        self._tag_image_reads = {}
+        # buffered writes (users, tag uses) are flushed this often, in seconds
+        self._flush_interval = 5
+        self._flusher = self.bot.loop.create_task(self._flush_loop())
+        self._closed = False
+        # IDs of the users who want report pings while offline, see `offline_ping_users()`
+        self._offline_ping_users = None
+        # all users ordered by karma, see `karma_index()`
+        self._karma_index = None
+        self._karma_index_lock = asyncio.Lock()
+        # user ID -> (karma_version, karma) of the newest karma change seen for that user
+        self._karma_latest = {}
+        # user ID -> (limit they were fetched with, most recent cases), see `rundown()`
+        self._rundowns = ExpiringDict(max_len=1000, max_age_seconds=60)
+        self._rundown_version = 0
+
         self.permissions = Permissions(self.bot, self)
 
         print("Loaded database")
 
+    def cog_unload(self):
+        if not self._closed:
+            self.bot.loop.create_task(self.close())
+
+    async def close(self) -> None:
+        """Write out the buffered changes (users, tag uses) and stop using the database.
+        Called by `Bot.close()`, so nothing from the last few seconds is lost on shutdown.
+        """
+
+        if self._closed:
+            return
+        self._closed = True
+
+        self._flusher.cancel()
+        for flush in (self.flush_users, self.flush_tag_uses):
+            try:
+                await flush()
+            except Exception:
+                traceback.print_exc()
+        self.db_executor.shutdown(wait=False)
+
     async def load_tasks(self):
         self.tasks = Tasks(self.bot)
 
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.permissions.invalidate(after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        self.permissions.invalidate(member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        # a role's permissions (i.e Manage Server) affect everyone who has it
+        self.permissions.invalidate()
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.permissions.invalidate()
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        # the guild owner might have changed
+        self.permissions.invalidate()
+
+    async def run_db(self, func, *args, **kwargs):
+        """Runs a blocking database call on the database thread pool, so that a slow query
+        doesn't hold up the event loop (and with it message filtering, antiraid, etc.)
+
+        Parameters
+        ----------
+        func : callable
+            The blocking function to run
+        *args, **kwargs
+            Arguments to pass to `func`
+
+        Returns
+        -------
+        Any
+            Whatever `func` returned.
+        """
+
+        return await self.bot.loop.run_in_executor(self.db_executor, functools.partial(func, *args, **kwargs))
+
     def guild(self) -> Guild:
-        """Returns the state of the main guild from the database.
+        """Returns the state of the main guild. The document is cached in memory and swapped
+        for a new one by `refresh_guild()` after a write, so this only blocks on the database
+        when nothing is cached yet, on startup.
 
         Returns
         -------
@@ -54,7 +174,72 @@ class Settings(commands.Cog):
             The Guild document object that holds information about the main guild.
         """
 
-        return Guild.objects(_id=self.guild_id).first()
+        if self._guild is None:
+            self.guild_cache_misses += 1
+            self._guild = Guild.objects(_id=self.guild_id).first()
+        else:
+            self.guild_cache_hits += 1
+
+        return self._guild
+
+    async def refresh_guild(self) -> Guild:
+        """Reloads the cached Guild document off the event loop. Must be awaited after any
+        write to the Guild document that doesn't go through the cached document itself
+        (i.e `update_one`). Until the new document is loaded, `guild()` keeps returning the
+        old one instead of blocking on the database.
+
+        Returns
+        -------
+        Guild
+            The freshly loaded Guild document.
+        """
+
+        self._guild_version += 1
+        version = self._guild_version
+        guild = await self.run_db(lambda: Guild.objects(_id=self.guild_id).first())
+
+        # a refresh started after this one loads a newer document, so leave the swap to it
+        if version == self._guild_version:
+            self.guild_cache_misses += 1
+            self._guild = guild
+            # role config might have changed
+            self.permissions.invalidate()
+
+        return guild
+
+    def word_filter(self) -> CompiledFilter:
+        """Returns the guild's filter words compiled for matching. The filter is only
+        compiled again when the filter list changed since the last time it was built.
+
+        Returns
+        -------
+        CompiledFilter
+            The compiled filter words of the main guild.
+        """
+
+        return self._compiled_filter("filter_words")
+
+    def raid_phrase_filter(self) -> CompiledFilter:
+        """Returns the guild's raid phrases compiled for matching, see `word_filter()`.
+
+        Returns
+        -------
+        CompiledFilter
+            The compiled raid phrases of the main guild.
+        """
+
+        return self._compiled_filter("raid_phrases")
+
+    def _compiled_filter(self, field: str) -> CompiledFilter:
+        guild = self.guild()
+        compiled, source = self._compiled_filters.get(field, (None, None))
+        if source is not guild:
+            words = getattr(guild, field)
+            if compiled is None or compiled.signature != CompiledFilter.signature_of(words):
+                compiled = CompiledFilter(words)
+            self._compiled_filters[field] = (compiled, guild)
+
+        return compiled
 
     async def all_rero_mappings(self):
         g = self.guild()
@@ -67,7 +252,7 @@ class Settings(commands.Cog):
         the_key = list(mapping.keys())[0]
         current[str(the_key)] = mapping[the_key]
         g.reaction_role_mapping = current
-        g.save()
+        await self.run_db(g.save)
 
     async def append_rero_mapping(self, mapping):
         g = self.guild()
@@ -75,7 +260,7 @@ class Settings(commands.Cog):
         the_key = list(mapping.keys())[0]
         current[str(the_key)] = current[str(the_key)] | mapping[the_key]
         g.reaction_role_mapping = current
-        g.save()
+        await self.run_db(g.save)
 
     async def get_rero_mapping(self, id):
         g = self.guild()
@@ -88,25 +273,92 @@ class Settings(commands.Cog):
         g = self.guild()
         if str(id) in g.reaction_role_mapping.keys():
             g.reaction_role_mapping.pop(str(id))
-            g.save()
+            await self.run_db(g.save)
 
     async def save_emoji_webhook(self, id):
-        g = Guild.objects(_id=self.guild_id).first()
+        g = self.guild()
         g.emoji_logging_webhook = id
-        g.save()
+        await self.run_db(g.save)
+
+    async def create_case(self, _id: int, case: Case) -> Case:
+        """Allocates the next available case ID and adds `case` to the cases of the user
+        with id `_id`. The ID is taken from Guild.case_id with an atomic find-and-modify,
+        so concurrent callers can never be handed the same ID.
+
+        Note that the `case_id` of the cached Guild document is not kept up to date,
+        this is the only place that should be used to hand out case IDs.
 
-    async def inc_caseid(self) -> None:
-        """Increments Guild.case_id, which keeps track of the next available ID to
-        use for a case.
+        Parameters
+        ----------
+        _id : int
+            ID of the user who we want to add the case to.
+        case : Case
+            The case we want to add to the user, its `_id` is set by this function.
+
+        Returns
+        -------
+        Case
+            The case that was added, with its ID.
         """
 
-        Guild.objects(_id=self.guild_id).update_one(inc__case_id=1)
+        def allocate_and_insert():
+            guild = Guild._get_collection().find_one_and_update(
+                {"_id": self.guild_id},
+                {"$inc": {"case_id": 1}},
+                projection={"case_id": True},
+                return_document=ReturnDocument.BEFORE)
+            case._id = guild["case_id"]
+            case.user_id = _id
+            case.validate()
+            Case._get_collection().insert_one(case.to_mongo())
+            ModStats._get_collection().bulk_write(mod_stats_updates([case]), ordered=False)
+
+        await self.run_db(allocate_and_insert)
+        self.invalidate_rundown(_id)
+        return case
+
+    async def create_cases(self, cases: list) -> list:
+        """Bulk version of `create_case`. Allocates a contiguous block of case IDs with a
+        single find-and-modify, then inserts all the cases with one bulk write.
+
+        Parameters
+        ----------
+        cases : list
+            List of (user ID, Case) pairs to add.
+
+        Returns
+        -------
+        list
+            The cases that were added, with their IDs, in the same order.
+        """
+
+        if not cases:
+            return []
+
+        def allocate_and_insert():
+            guild = Guild._get_collection().find_one_and_update(
+                {"_id": self.guild_id},
+                {"$inc": {"case_id": len(cases)}},
+                projection={"case_id": True},
+                return_document=ReturnDocument.BEFORE)
+
+            documents = []
+            for i, (_id, case) in enumerate(cases):
+                case._id = guild["case_id"] + i
+                case.user_id = _id
+                case.validate()
+                documents.append(case.to_mongo())
+            Case._get_collection().insert_many(documents, ordered=False)
+            ModStats._get_collection().bulk_write(mod_stats_updates([case for _, case in cases]), ordered=False)
+
+        await self.run_db(allocate_and_insert)
+        for _id, _ in cases:
+            self.invalidate_rundown(_id)
+        return [case for _, case in cases]
 
     async def add_case(self, _id: int, case: Case) -> None:
-        """Cases holds all the cases for a particular user with id `_id` as an
-        EmbeddedDocumentListField. This function appends a given case object to
-        this list. If this user doesn't have any previous cases, we first add
-        a new Cases document to the database.
+        """Add a case that already has an ID to the cases of the user with id `_id`.
+        New cases should go through `create_case` instead, which also allocates the ID.
 
         Parameters
         ----------
@@ -116,20 +368,53 @@ class Settings(commands.Cog):
             The case we want to add to the user.
         """
 
-        # ensure this user has a cases document before we try to append the new case
-        await self.cases(_id)
-        Cases.objects(_id=_id).update_one(push__cases=case)
+        case.user_id = _id
+
+        def insert():
+            case.save(force_insert=True)
+            ModStats._get_collection().bulk_write(mod_stats_updates([case]), ordered=False)
+
+        await self.run_db(insert)
+        self.invalidate_rundown(_id)
+
+    async def update_case(self, case: Case, old_reason: str = None) -> None:
+        """Save the changes made to an existing case (i.e lifting a warn).
+
+        Parameters
+        ----------
+        case : Case
+            The case that was changed, from `get_case`.
+        old_reason : str, optional
+            The reason the case had before, if it was changed, so that mod stats can be updated
+        """
+
+        def save():
+            case.save()
+            if old_reason is not None and reason_key(old_reason) != reason_key(case.reason):
+                inc = {}
+                if reason_key(old_reason):
+                    inc[f"reasons.{reason_key(old_reason)}"] = -1
+                if reason_key(case.reason):
+                    inc[f"reasons.{reason_key(case.reason)}"] = 1
+                if inc:
+                    ModStats._get_collection().update_one({"_id": case.mod_id}, {"$inc": inc}, upsert=True)
+
+        await self.run_db(save)
+        self.invalidate_rundown(case.user_id)
 
     async def add_filtered_word(self, fw: FilterWord) -> None:
         existing = self.guild().filter_words.filter(word=fw.word)
         if(len(existing) > 0):
             return False
 
-        Guild.objects(_id=self.guild_id).update_one(push__filter_words=fw)
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(push__filter_words=fw))
+        await self.refresh_guild()
         return True
 
     async def remove_filtered_word(self, word: str):
-        return Guild.objects(_id=self.guild_id).update_one(pull__filter_words__word=FilterWord(word=word).word)
+        res = await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(pull__filter_words__word=FilterWord(word=word).word))
+        await self.refresh_guild()
+        return res
 
     async def mark_false_positive(self, word: str):
         g = self.guild()
@@ -138,70 +423,161 @@ class Settings(commands.Cog):
             if w.word == word:
                 w.false_positive = True
                 g.filter_words = fw
-                g.save()
+                await self.run_db(g.save)
+                # the document was changed in place, so the compiled filter can't tell
+                await self.refresh_guild()
                 return True
             
         return False
 
     async def add_tag(self, tag: Tag) -> None:
-        Guild.objects(_id=self.guild_id).update_one(push__tags=tag)
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(push__tags=tag))
+        await self.refresh_guild()
 
     async def remove_tag(self, _id: int):
-        return Guild.objects(_id=self.guild_id).update_one(pull__tags___id=Tag(_id=_id)._id)
+        tag = await self.get_tag(_id)
+        if tag is not None and tag.image.grid_id is not None:
+            self._tag_images.pop(tag.image.grid_id)
+        res = await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(pull__tags___id=Tag(_id=_id)._id))
+        await self.refresh_guild()
+        return res
+
+    def _tags(self) -> tuple:
+        g = self.guild()
+        # rebuilt whenever the cached Guild document is replaced, i.e after adding/removing a tag
+        if self._tag_index is None or self._tag_index[0] is not g:
+            by_name, by_id = {}, {}
+            for t in g.tags:
+                by_name.setdefault((t.name, t.args), t)
+                by_id.setdefault(t._id, t)
+            self._tag_index = (g, by_name, by_id)
+            self._tag_uses_flushed = Counter()
+
+        return self._tag_index
 
     async def get_tag(self, _id: int):
-        g = Guild.objects(_id=self.guild_id).first()
-        for t in g.tags:
-            if t._id == _id:
-                t.use_count += 1
-                g.save()
-                return t
-        return None
+        return self._tags()[2].get(_id)
     
     async def get_tag_by_name(self, name: str, args: bool):
-        g = Guild.objects(_id=self.guild_id).first()
-        for t in g.tags:
-            if t.name  == name and t.args == args:
-                t.use_count += 1
-                g.save()
-                return t
-        return None
+        return self._tags()[1].get((name, args))
+
+    async def tag_image(self, tag: Tag):
+        """Read the image attached to a tag. Images are cached in memory (up to
+        CHROMEY_TAG_IMAGE_CACHE_MB), so popular tags are only read from GridFS once.
+
+        Parameters
+        ----------
+        tag : Tag
+            The tag whose image to read
+
+        Returns
+        -------
+        tuple
+            (image bytes, content type), or None if the tag has no image.
+        """
+
+        grid_id = tag.image.grid_id
+        if grid_id is None:
+            return None
+
+        image = self._tag_images.get(grid_id)
+        if image is not None:
+            return image
+
+        # concurrent uses of a tag that isn't cached share a single read
+        task = self._tag_image_reads.get(grid_id)
+        if task is None:
+            task = self._tag_image_reads[grid_id] = self.bot.loop.create_task(self._read_tag_image(tag.image.fs, grid_id))
+            task.add_done_callback(lambda _: self._tag_image_reads.pop(grid_id, None))
+
+        # shielded, so that one cancelled waiter doesn't cancel the read for everyone else
+        return await asyncio.shield(task)
+
+    async def _read_tag_image(self, fs, grid_id):
+        def read():
+            # a fresh handle every time, the GridFSProxy on the (long lived) cached
+            # Guild document keeps its file open, and a second read() of it returns b''
+            try:
+                grid = fs.get(grid_id)
+            except NoFile:
+                return None
+            data = grid.read()
+            return (data, grid.content_type) if data else None
+
+        image = await self.run_db(read)
+        if image is not None:
+            self._tag_images.put(grid_id, *image)
+        return image
+
+    def use_tag(self, tag: Tag) -> None:
+        """Count a use of a tag. Uses are buffered and written by `flush_tag_uses()`."""
+
+        self._tag_uses[tag._id] += 1
+
+    def tag_uses(self, tag: Tag) -> int:
+        """The number of times a tag was used, including uses that weren't written yet."""
+
+        self._tags()
+        return tag.use_count + self._tag_uses_flushed[tag._id] + self._tag_uses[tag._id]
+
+    async def flush_tag_uses(self) -> None:
+        """Write the buffered tag uses, as one positional `$inc` per tag instead of saving
+        the whole Guild document on every use.
+        """
+
+        if not self._tag_uses:
+            return
+
+        uses, self._tag_uses = self._tag_uses, Counter()
+        ops = [UpdateOne({"_id": self.guild_id, "tags._id": _id}, {"$inc": {"tags.$.use_count": count}})
+               for _id, count in uses.items()]
+
+        try:
+            await self.run_db(lambda: Guild._get_collection().bulk_write(ops, ordered=False))
+        except Exception:
+            self._tag_uses.update(uses)
+            raise
+
+        self._tag_uses_flushed.update(uses)
 
     async def add_whitelisted_guild(self, id: int):
         g = Guild.objects(_id=self.guild_id)
-        g2 = g.first()
+        g2 = self.guild()
         if id not in g2.filter_excluded_guilds:
-            g.update_one(push__filter_excluded_guilds=id)
+            await self.run_db(g.update_one, push__filter_excluded_guilds=id)
+            await self.refresh_guild()
             return True
         return False
 
     async def remove_whitelisted_guild(self, id: int):
         g = Guild.objects(_id=self.guild_id)
-        g2 = g.first()
+        g2 = self.guild()
         if id in g2.filter_excluded_guilds:
-            g.update_one(pull__filter_excluded_guilds=id)
+            await self.run_db(g.update_one, pull__filter_excluded_guilds=id)
+            await self.refresh_guild()
             return True
         return False
 
     async def add_ignored_channel(self, id: int):
         g = Guild.objects(_id=self.guild_id)
-        g2 = g.first()
+        g2 = self.guild()
         if id not in g2.filter_excluded_channels:
-            g.update_one(push__filter_excluded_channels=id)
+            await self.run_db(g.update_one, push__filter_excluded_channels=id)
+            await self.refresh_guild()
             return True
         return False
 
     async def remove_ignored_channel(self, id: int):
         g = Guild.objects(_id=self.guild_id)
-        g2 = g.first()
+        g2 = self.guild()
         if id in g2.filter_excluded_channels:
-            g.update_one(pull__filter_excluded_channels=id)
+            await self.run_db(g.update_one, pull__filter_excluded_channels=id)
+            await self.refresh_guild()
             return True
         return False
 
     async def get_case(self, _id: int, case_id: int) -> Case:
         """Get the case with ID `case_id`, which belongs to the punishee given by ID `_id`.
-        If the user doesn't have a Cases document in the database, first create that.
 
         Parameters
         ----------
@@ -213,17 +589,18 @@ class Settings(commands.Cog):
         Returns
         -------
         Case
-            The Case object representing the case.
+            The Case object representing the case, or None if the user has no such case.
         """
 
-        # first we ensure this user has a Cases document in the database before continuing
-        await self.cases(_id)
-        case = Cases.objects(_id=_id).first()
-        return case
+        return await self.run_db(lambda: Case.objects(_id=case_id, user_id=_id).first())
 
     async def user(self, id: int) -> User:
         """Look up the User document of a user, whose ID is given by `id`.
-        If the user doesn't have a User document in the database, first create that.
+        Documents are kept in an LRU cache, so repeated lookups (i.e the mod list in
+        reports) don't go to the database. If the user doesn't have a User document in the
+        database, a default one is returned; it is only written once a field changes.
+
+        Changes must go through `update_user()`, not `User.save()`.
 
         Parameters
         ----------
@@ -236,131 +613,462 @@ class Settings(commands.Cog):
             The User document we found from the database.
         """
 
-        user = User.objects(_id=id).first()
-        # first we ensure this user has a User document in the database before continuing
-        if not user:
+        user = self._users.get(id)
+        if user is not None:
+            self._users.move_to_end(id)
+            return user
+
+        def load():
+            # leave out the karma history of users from before migrate_karma.py was run
+            user = User._get_collection().find_one({"_id": id}, {"karma_received_history": False, "karma_given_history": False})
+            return User._from_son(user) if user is not None else None
+
+        user = await self.run_db(load)
+        # someone else might have loaded (and changed) this user while we were waiting
+        if id in self._users:
+            return self._users[id]
+
+        if user is None:
             user = User()
             user._id = id
-            user.save()
+
+        # changes that haven't been flushed yet, if this user was evicted in the meantime
+        for field, value in self._user_dirty.get(id, {}).items():
+            setattr(user, field, value)
+        # karma changed while we were loading the user
+        latest = self._karma_latest.get(id)
+        if latest is not None and latest[0] > user.karma_version:
+            user.karma_version, user.karma = latest
+
+        self._users[id] = user
+        while len(self._users) > self.user_cache_size:
+            self._users.popitem(last=False)
+
         return user
 
-    async def leaderboard(self) -> list:
-        return User.objects[0:30].only('_id', 'karma').order_by('-karma', '-_id').select_related()
+    def update_user(self, user: User, **fields) -> None:
+        """Change fields of a User document. The cached document is updated right away,
+        the database write is coalesced with other changes and done by `flush_users()`.
+
+        Parameters
+        ----------
+        user : User
+            The User document to update, from `user()`
+        **fields
+            The fields to set, i.e `is_muted=True`
+        """
+
+        # karma is written right away by `set_karma()`/`add_karma()`, a delayed write would
+        # clobber the increments made in the meantime
+        if "karma" in fields:
+            raise ValueError("karma must be changed with set_karma() or add_karma()")
+
+        for field, value in fields.items():
+            setattr(user, field, value)
+        self._user_dirty.setdefault(user._id, {}).update(fields)
+
+        if "offline_report_ping" in fields and self._offline_ping_users is not None:
+            if fields["offline_report_ping"]:
+                self._offline_ping_users.add(user._id)
+            else:
+                self._offline_ping_users.discard(user._id)
+
+    async def offline_ping_users(self) -> set:
+        """The IDs of the users who want to be pinged for reports even while offline.
+        Loaded from the database with a single query the first time, then kept up to date
+        by `update_user()`.
+
+        Returns
+        -------
+        set
+            IDs of the users with `offline_report_ping` set.
+        """
+
+        if self._offline_ping_users is None:
+            ids = await self.run_db(lambda: set(User._get_collection().distinct("_id", {"offline_report_ping": True})))
+            # an !offlineping toggled while the query was running is already in the unflushed changes
+            for id, fields in self._user_dirty.items():
+                if fields.get("offline_report_ping") is True:
+                    ids.add(id)
+                elif fields.get("offline_report_ping") is False:
+                    ids.discard(id)
+            if self._offline_ping_users is None:
+                self._offline_ping_users = ids
+
+        return self._offline_ping_users
+
+    async def flush_users(self) -> None:
+        """Write all pending User changes to the database in a single bulk write. Users that
+        don't have a document yet are created (with the default values for the other fields).
+        """
+
+        if not self._user_dirty:
+            return
+
+        dirty, self._user_dirty = self._user_dirty, {}
+
+        ops = []
+        for id, fields in dirty.items():
+            update = {name: User._fields[name].to_mongo(value) for name, value in fields.items()}
+            defaults = {name: field.to_mongo(field.default() if callable(field.default) else field.default)
+                        for name, field in User._fields.items()
+                        if name not in update and name not in ("_id", "id") and field.default is not None}
+
+            op = {"$set": update}
+            if defaults:
+                op["$setOnInsert"] = defaults
+            ops.append(UpdateOne({"_id": id}, op, upsert=True))
+
+        try:
+            result = await self.run_db(lambda: User._get_collection().bulk_write(ops, ordered=False))
+        except Exception:
+            # put the changes back so they're retried with the next flush, without
+            # overwriting anything that was changed since
+            for id, fields in dirty.items():
+                self._user_dirty[id] = {**fields, **self._user_dirty.get(id, {})}
+            raise
+
+        # new users start out with 0 karma, and count towards the total for `karma_rank()`
+        if self._karma_index is not None:
+            for id in result.upserted_ids.values():
+                if id not in self._karma_index:
+                    self._karma_index.update(id, 0)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            for flush in (self.flush_users, self.flush_tag_uses):
+                try:
+                    await flush()
+                except Exception:
+                    traceback.print_exc()
+
+    def _karma_changed(self, id: int, karma: int, version: int) -> None:
+        # keep the cached document and the karma index in line with the database. Concurrent
+        # changes can complete out of order, so only the newest version is applied
+        latest = self._karma_latest.get(id)
+        if latest is not None and latest[0] >= version:
+            return
+        self._karma_latest[id] = (version, karma)
+
+        user = self._users.get(id)
+        if user is not None:
+            user.karma, user.karma_version = karma, version
+
+        if self._karma_index is not None:
+            self._karma_index.update(id, karma)
+
+    async def set_karma(self, id: int, karma: int) -> None:
+        """Set the karma of a user, whose ID is given by `id`.
+
+        Parameters
+        ----------
+        id : int
+            The user whose karma to set
+        karma : int
+            The new karma
+        """
+
+        user = await self.run_db(lambda: User._get_collection().find_one_and_update(
+            {"_id": id},
+            {"$set": {"karma": karma}, "$inc": {"karma_version": 1}},
+            projection={"karma": True, "karma_version": True},
+            upsert=True,
+            return_document=ReturnDocument.AFTER))
+        self._karma_changed(id, user["karma"], user["karma_version"])
+
+    async def add_karma(self, from_id: int, to_id: int, amount: int, reason: str) -> int:
+        """Give karma to (or with a negative `amount`, take karma from) a user. The karma
+        is added with an atomic `$inc`, so concurrent gives can't overwrite each other, and
+        the event is stored in the karma history at the same time.
+
+        Parameters
+        ----------
+        from_id : int
+            The user giving the karma
+        to_id : int
+            The user receiving the karma
+        amount : int
+            How much karma to give
+        reason : str
+            Reason for giving it
+
+        Returns
+        -------
+        int
+            The receiver's karma afterwards.
+        """
+
+        event = KarmaEvent(to_id=to_id, from_id=from_id, amount=amount, reason=reason)
+        # the two writes are independent, so send them in parallel
+        _, user = await asyncio.gather(
+            self.run_db(event.save),
+            self.run_db(lambda: User._get_collection().find_one_and_update(
+                {"_id": to_id},
+                {"$inc": {"karma": amount, "karma_version": 1}},
+                projection={"karma": True, "karma_version": True},
+                upsert=True,
+                return_document=ReturnDocument.AFTER)))
+
+        self._karma_changed(to_id, user["karma"], user["karma_version"])
+        return user["karma"]
+
+    async def karma_history(self, id: int, given: bool = False, skip: int = 0, limit: int = 0) -> list:
+        """The karma a user received (or gave), newest first. Use `skip` and `limit`
+        to fetch a single page.
+
+        Parameters
+        ----------
+        id : int
+            The user whose history to look up
+        given : bool, optional
+            Look up the karma the user gave instead of received, by default False
+        skip : int, optional
+            How many of the newest events to skip, by default 0
+        limit : int, optional
+            How many events to return, by default 0 (all of them)
+
+        Returns
+        -------
+        list
+            The KarmaEvents.
+        """
+
+        query = {"from_id": id} if given else {"to_id": id}
+        return await self.run_db(lambda: list(KarmaEvent.objects(**query).order_by('-date').skip(skip).limit(limit)))
+
+    async def count_karma_history(self, id: int, given: bool = False) -> int:
+        """The number of times a user received (or gave) karma, see `karma_history()`."""
+
+        query = {"from_id": id} if given else {"to_id": id}
+        return await self.run_db(lambda: KarmaEvent._get_collection().count_documents(query))
+
+    async def karma_index(self) -> KarmaIndex:
+        """All users ordered by karma. Loaded from the database the first time, then kept
+        up to date as karma changes.
+
+        Returns
+        -------
+        KarmaIndex
+            The index.
+        """
+
+        if self._karma_index is None:
+            async with self._karma_index_lock:
+                if self._karma_index is None:
+                    users = await self.run_db(lambda: list(User._get_collection().find({}, {"karma": True, "karma_version": True})))
+                    index = KarmaIndex()
+                    index.load((user["_id"], user.get("karma", 0)) for user in users)
+                    # karma changes that completed while the query was running
+                    versions = {user["_id"]: user.get("karma_version", 0) for user in users}
+                    for id, (version, karma) in self._karma_latest.items():
+                        if version > versions.get(id, 0):
+                            index.update(id, karma)
+                    self._karma_index = index
+
+        return self._karma_index
+
+    async def leaderboard(self, limit: int = 30, include=None) -> list:
+        """The users with the most karma.
+
+        Parameters
+        ----------
+        limit : int, optional
+            How many users to return, by default 30
+        include : callable, optional
+            Called with a user ID, only users for which it returns True are on the leaderboard
+            (i.e to leave out staff), by default everyone is
+
+        Returns
+        -------
+        list
+            (user ID, karma) pairs, highest karma first.
+        """
+
+        results = []
+        for id, karma in await self.karma_index():
+            if len(results) >= limit:
+                break
+            if include is None or include(id):
+                results.append((id, karma))
+
+        return results
         
     async def karma_rank(self, _id) -> list:
-        karma = (await self.bot.settings.user(_id)).karma
-        users = User.objects().only('_id', 'karma')
-        overall = users().count()
-        rank = users(karma__gte=karma).count()
-        return karma, rank, overall
+        karma = (await self.user(_id)).karma
+        index = await self.karma_index()
+        return karma, index.rank(karma), len(index)
     
     async def transfer_profile(self, oldmember, newmember):
+        # the profile is copied in the database, so make sure it's up to date there first
+        await self.flush_users()
         u = await self.user(oldmember)
-        u._id = newmember
-        u.save()
-        
-        u2 = await self.user(oldmember)
-        u2.save()
-        
-        cases = await self.cases(oldmember)
-        cases._id = newmember
-        cases.save()
+        profile = u.to_mongo().to_dict()
+        profile.pop("_id", None)
+        profile.pop("karma_version", None)
+        new = await self.run_db(lambda: User._get_collection().find_one_and_update(
+            {"_id": newmember},
+            {"$set": profile, "$inc": {"karma_version": 1}},
+            projection={"karma": True, "karma_version": True},
+            upsert=True,
+            return_document=ReturnDocument.AFTER))
+        self._users.pop(newmember, None)
+        self._karma_changed(newmember, new["karma"], new["karma_version"])
+
+        await self.run_db(lambda: KarmaEvent.objects(to_id=oldmember).update(set__to_id=newmember))
+        await self.run_db(lambda: KarmaEvent.objects(from_id=oldmember).update(set__from_id=newmember))
         
-        cases2 = await self.cases(oldmember)
-        cases2.cases = []
-        cases2.save()
+        case_count = await self.run_db(lambda: Case.objects(user_id=oldmember).update(set__user_id=newmember))
+        self.invalidate_rundown(oldmember)
+        self.invalidate_rundown(newmember)
         
-        return u, len(cases.cases)
+        return u, case_count
 
-    async def cases(self, id: int) -> Cases:
-        """Return the Document representing the cases of a user, whose ID is given by `id`
-        If the user doesn't have a Cases document in the database, first create that.
+    async def cases(self, id: int, skip: int = 0, limit: int = 0) -> list:
+        """Return the cases of a user (other than unmutes), whose ID is given by `id`,
+        newest first. Use `skip` and `limit` to fetch a single page of cases.
 
         Parameters
         ----------
         id : int
             The user whose cases we want to look up.
+        skip : int, optional
+            How many of the newest cases to skip, by default 0
+        limit : int, optional
+            How many cases to return, by default 0 (all of them)
 
         Returns
         -------
-        Cases
-            [description]
+        list
+            The user's cases.
         """
 
-        cases = Cases.objects(_id=id).first()
-        # first we ensure this user has a Cases document in the database before continuing
-        if cases is None:
-            cases = Cases()
-            cases._id = id
-            cases.save()
-        return cases
+        return await self.run_db(lambda: list(Case.objects(user_id=id, _type__ne="UNMUTE").order_by('-date').skip(skip).limit(limit)))
+
+    async def count_cases(self, id: int) -> int:
+        """Return the number of cases (other than unmutes) of a user, whose ID is given by `id`.
+
+        Parameters
+        ----------
+        id : int
+            The user whose cases we want to count.
+
+        Returns
+        -------
+        int
+            The number of cases.
+        """
 
-    async def rundown(self, id: int) -> list:
-        """Return the 3 most recent cases of a user, whose ID is given by `id`
-        If the user doesn't have a Cases document in the database, first create that.
+        return await self.run_db(lambda: Case._get_collection().count_documents({"user_id": id, "_type": {"$ne": "UNMUTE"}}))
+
+    async def rundown(self, id: int, limit: int = 3) -> list:
+        """Return the most recent cases of a user (other than unmutes), whose ID is given by `id`.
+        The result is cached for a short while, see `invalidate_rundown()`.
+
+        The returned cases are shared with the cache, so they must not be modified.
 
         Parameters
         ----------
         id : int
             The user whose cases we want to look up.
+        limit : int, optional
+            How many cases to return, by default 3
 
         Returns
         -------
-        Cases
-            [description]
+        list
+            The user's most recent cases, newest first.
         """
 
-        cases = Cases.objects(_id=id).first()
-        # first we ensure this user has a Cases document in the database before continuing
-        if cases is None:
-            cases = Cases()
-            cases._id = id
-            cases.save()
-            return []
+        cached = self._rundowns.get(id)
+        if cached is not None:
+            fetched_limit, cases = cached
+            # fewer cases than we asked for means that's all of them
+            if len(cases) >= limit or len(cases) < fetched_limit:
+                return cases[0:limit]
+
+        version = self._rundown_version
+        cases = await self.cases(id, limit=limit)
+        # don't cache the result if a case was added or changed while we were fetching it
+        if version == self._rundown_version:
+            self._rundowns[id] = (limit, cases)
 
-        cases = cases.cases
-        cases = filter(lambda x: x._type != "UNMUTE", cases)
-        cases = sorted(cases, key=lambda i: i['date'])
-        cases.reverse()
-        return cases[0:3]
+        return cases
+
+    def invalidate_rundown(self, id: int) -> None:
+        """Drops the cached rundown of a user. Must be called after changing any of their cases.
+
+        Parameters
+        ----------
+        id : int
+            The user whose cases were changed.
+        """
+
+        self._rundowns.pop(id, None)
+        self._rundown_version += 1
 
     async def get_locked_channels(self):
         return self.guild().locked_channels
 
     async def add_locked_channels(self, channel):
-        Guild.objects(_id=self.guild_id).update_one(push__locked_channels=channel)
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(push__locked_channels=channel))
+        await self.refresh_guild()
 
     async def remove_locked_channels(self, channel):
-        Guild.objects(_id=self.guild_id).update_one(pull__locked_channels=channel)
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(pull__locked_channels=channel))
+        await self.refresh_guild()
 
     async def add_raid_phrase(self, phrase: str) -> bool:
         existing = self.guild().raid_phrases.filter(word=phrase)
         if(len(existing) > 0):
             return False
-        Guild.objects(_id=self.guild_id).update_one(push__raid_phrases=FilterWord(word=phrase, bypass=5, notify=True))
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(push__raid_phrases=FilterWord(word=phrase, bypass=5, notify=True)))
+        await self.refresh_guild()
         return True
     
     async def remove_raid_phrase(self, phrase: str):
-        Guild.objects(_id=self.guild_id).update_one(pull__raid_phrases__word=FilterWord(word=phrase).word)
+        await self.run_db(lambda: Guild.objects(_id=self.guild_id).update_one(pull__raid_phrases__word=FilterWord(word=phrase).word))
+        await self.refresh_guild()
 
     async def fetch_cases_by_mod(self, _id):
-        values = {}
-        cases = Cases.objects(cases__mod_id=str(_id))
-        values["total"] = 0
-        cases = list(cases.all())
-        final_cases = []
-        for case in cases:
-            for c in case.cases:
-                final_cases.append(c)
-                values["total"] += 1
-
-        def get_case_reason(reason):
-            string = reason.lower()
-            return ''.join(e for e in string if e.isalnum() or e == " ").strip()
-        case_reasons = [get_case_reason(case.reason) for case in final_cases if get_case_reason(case.reason) != "temporary mute expired"]
-        values["counts"] = sorted(Counter(case_reasons).items(), key=lambda item: item[1])
-        values["counts"].reverse()
-        return values
+        """Statistics about the cases a moderator made. These are counters kept up to date
+        as cases are created, so this is a single document lookup no matter how many cases
+        there are. Counters for cases from before they existed are filled in by `migrate_cases.py`.
+
+        Parameters
+        ----------
+        _id : int
+            ID of the moderator
+
+        Returns
+        -------
+        dict
+            "total" is the number of cases, "counts" is a list of (reason, number of cases)
+            pairs, most common first.
+        """
+
+        stats = await self.run_db(lambda: ModStats.objects(_id=_id).first())
+        if stats is None:
+            return {"total": 0, "counts": []}
+
+        counts = [(reason, count) for reason, count in stats.reasons.items() if count > 0 and reason != "temporary mute expired"]
+        return {
+            "total": stats.total,
+            "counts": sorted(counts, key=lambda item: item[1], reverse=True)
+        }
+
+
+def mod_stats_updates(cases: list) -> list:
+    """The updates to the mod stats counters for adding `cases`, one per moderator."""
+
+    incs = {}
+    for case in cases:
+        inc = incs.setdefault(case.mod_id, Counter())
+        inc["total"] += 1
+        if reason_key(case.reason):
+            inc[f"reasons.{reason_key(case.reason)}"] += 1
+
+    return [UpdateOne({"_id": mod_id}, {"$inc": dict(inc)}, upsert=True) for mod_id, inc in incs.items()]
 
 
 class Permissions:
@@ -387,29 +1095,10 @@ class Permissions:
 
         self.bot = bot
         self.settings = settings
-        guild_id = self.settings.guild_id
-        the_guild = settings.guild()
-
-        # This dict maps a permission level to a lambda function which, when given the right paramters,
-        # will return True or False if a user has that permission level.
-        self.permissions = {
-            0: lambda x, y: True,
-
-            1: (lambda guild, m: self.hasAtLeast(guild, m, 2) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_nerds) in m.roles)),
-
-            2: (lambda guild, m: self.hasAtLeast(guild, m, 3) or (guild.id == guild_id
-                and guild.get_role(the_guild.role_moderator) in m.roles)),
 
-            3: (lambda guild, m: self.hasAtLeast(guild, m, 4) or (guild.id == guild_id
-                and m.guild_permissions.manage_guild)),
-
-            4: (lambda guild, m: self.hasAtLeast(guild, m, 5) or (guild.id == guild_id
-                and m == guild.owner)),
-
-            5: (lambda guild, m: guild.id == guild_id
-                 and m.id == bot.owner_id),
-        }
+        # memoized permission levels, maps a member ID to a tuple of
+        # (the role IDs the level was computed from, level). See `level()`
+        self._levels = {}
 
         self.permission_names = {
             0: "Everyone and up",
@@ -420,9 +1109,70 @@ class Permissions:
             5: "Bot owner",
         }
 
+    def level(self, guild: discord.Guild, member: discord.Member) -> int:
+        """Computes the permission level of `member` in `guild` in one pass. The result is
+        memoized per member and keyed on the member's role IDs, so a role change is picked up
+        on the next call. Anything else that can change a level (role permissions, guild owner,
+        role config in the database) has to call `invalidate()`.
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            The guild to check
+        member : discord.Member
+            The member whose permission level we're computing
+
+        Returns
+        -------
+        int
+            The permission level of the member, 0 to 5.
+        """
+
+        if guild is None or guild.id != self.settings.guild_id:
+            return 0
+
+        if member.id == self.bot.owner_id:
+            return 5
+
+        is_member = isinstance(member, discord.Member)
+        role_ids = frozenset(role.id for role in member.roles) if is_member else frozenset()
+
+        cached = self._levels.get(member.id)
+        if cached is not None and cached[0] == role_ids:
+            return cached[1]
+
+        the_guild = self.settings.guild()
+        if member.id == guild.owner_id:
+            level = 4
+        elif is_member and member.guild_permissions.manage_guild:
+            level = 3
+        elif the_guild.role_moderator in role_ids:
+            level = 2
+        elif the_guild.role_nerds in role_ids:
+            level = 1
+        else:
+            level = 0
+
+        self._levels[member.id] = (role_ids, level)
+        return level
+
+    def invalidate(self, member_id: int = None) -> None:
+        """Forget the memoized permission level of a member, or of everyone if no ID is given.
+
+        Parameters
+        ----------
+        member_id : int, optional
+            The member whose level to forget, by default None
+        """
+
+        if member_id is None:
+            self._levels.clear()
+        else:
+            self._levels.pop(member_id, None)
+
     def hasAtLeast(self, guild: discord.Guild, member: discord.Member, level: int) -> bool:
         """Checks whether a user given by `member` has at least the permission level `level`
-        in guild `guild`. Using the `self.permissions` dict-lambda thing.
+        in guild `guild`.
 
         Parameters
         ----------
@@ -439,7 +1189,7 @@ class Permissions:
             True if the user has that level, otherwise False.
         """
 
-        return self.permissions[level](guild, member)
+        return self.level(guild, member) >= level
 
     def level_info(self, level: int) -> str:
         return self.permission_names[level]
@@ -447,3 +1197,4 @@ class Permissions:
 
 def setup(bot):
     bot.add_cog(Settings(bot))
+
@@ -162,18 +162,15 @@ async def remove_mute(id: int) -> None:
             if user is not None:
                 await user.remove_roles(mute_role)
                 case = Case(
-                    _id=BOT_GLOBAL.settings.guild().case_id,
                     _type="UNMUTE",
                     mod_id=BOT_GLOBAL.user.id,
                     mod_tag=str(BOT_GLOBAL.user),
                     reason="Temporary mute expired.",
                 )
-                await BOT_GLOBAL.settings.inc_caseid()
-                await BOT_GLOBAL.settings.add_case(user.id, case)
+                await BOT_GLOBAL.settings.create_case(user.id, case)
 
                 u = await BOT_GLOBAL.settings.user(id=user.id)
-                u.is_muted = False
-                u.save()
+                BOT_GLOBAL.settings.update_user(u, is_muted=False)
 
                 log = await prepare_unmute_log(BOT_GLOBAL.user, user, case)
 
@@ -187,18 +184,15 @@ async def remove_mute(id: int) -> None:
                     pass                    
             else:
                 case = Case(
-                    _id=BOT_GLOBAL.settings.guild().case_id,
                     _type="UNMUTE",
                     mod_id=BOT_GLOBAL.user.id,
                     mod_tag=str(BOT_GLOBAL.user),
                     reason="Temporary mute expired.",
                 )
-                await BOT_GLOBAL.settings.inc_caseid()
-                await BOT_GLOBAL.settings.add_case(id, case)
+                await BOT_GLOBAL.settings.create_case(id, case)
 
                 u = await BOT_GLOBAL.settings.user(id=id)
-                u.is_muted = False
-                u.save()
+                BOT_GLOBAL.settings.update_user(u, is_muted=False)
 
 def reminder_callback(id: int, reminder: str):
     BOT_GLOBAL.loop.create_task(remind(id, reminder))
@@ -0,0 +1,137 @@
+from collections import deque
+
+"""
+Multi-pattern matching for the word filter. Instead of running one substring
+scan per filtered word, all the words are compiled into an Aho-Corasick automaton
+so that a message can be checked against every word in a single pass.
+"""
+
+
+class Automaton:
+    """Aho-Corasick automaton over a list of patterns. `search` returns the indices
+    of every pattern that occurs in the given text.
+    """
+
+    def __init__(self, patterns: list):
+        # goto[node] maps a character to the next node, fail[node] is the node of the
+        # longest proper suffix that is also in the trie, output[node] holds the
+        # indices of the patterns that end at that node (including via fail links)
+        self.goto = [{}]
+        self.fail = [0]
+        output = [[]]
+
+        for i, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+
+            node = 0
+            for char in pattern:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    output.append([])
+                    self.goto[node][char] = child
+                node = child
+            output[node].append(i)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                output[child].extend(output[self.fail[child]])
+
+        self.output = [tuple(o) for o in output]
+        self.empty = len(self.goto) == 1
+
+    def search(self, text: str) -> set:
+        found = set()
+        if self.empty:
+            return found
+
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+
+        return found
+
+
+class CompiledFilter:
+    """A list of FilterWords compiled into automatons, one for the folded message and
+    one for the folded message without spaces/punctuation. Words marked as false positive
+    are only matched against the folded message, like the original per-word checks.
+
+    Words are bucketed by the permission level that can bypass them: each level gets its
+    own pair of automatons containing only the words that members of that level can't
+    bypass, so a message is only ever matched against the words that apply to its author.
+    """
+
+    def __init__(self, words: list):
+        self.words = list(words)
+        self.signature = CompiledFilter.signature_of(self.words)
+        # permission level -> (word indices, full automaton, collapsed automaton),
+        # built the first time a member of that level is checked
+        self._buckets = {}
+
+    @staticmethod
+    def signature_of(words: list) -> tuple:
+        """Everything about a list of FilterWords that affects matching, used to tell
+        whether the filter list has changed and needs to be compiled again.
+        """
+
+        return tuple((word.word, word.bypass, word.notify, word.false_positive) for word in words)
+
+    def _bucket(self, level: int) -> tuple:
+        bucket = self._buckets.get(level)
+        if bucket is None:
+            # a member can bypass a word if their level is at least the word's bypass level
+            indices = [i for i, word in enumerate(self.words) if word.bypass > level]
+            patterns = [self.words[i].word.lower() for i in indices]
+            full = Automaton(patterns)
+            collapsed = Automaton(
+                [pattern if not self.words[i].false_positive else "" for pattern, i in zip(patterns, indices)])
+            bucket = self._buckets[level] = (indices, full, collapsed)
+
+        return bucket
+
+    def match(self, normalized, level: int) -> list:
+        """Find the filtered words present in a message that can't be bypassed by its author.
+
+        Parameters
+        ----------
+        normalized : NormalizedText
+            The normalized forms of the message, see `cogs.utils.normalize`
+        level : int
+            The permission level of the author of the message
+
+        Returns
+        -------
+        list
+            The FilterWords that were found, in the same order as the filter list.
+        """
+
+        indices, full, collapsed = self._bucket(level)
+        if full.empty:
+            return []
+
+        found = full.search(normalized.folded)
+        if not collapsed.empty:
+            found |= collapsed.search(normalized.without_spaces)
+            found |= collapsed.search(normalized.without_punctuation)
+
+        return [self.words[indices[i]] for i in sorted(found)]
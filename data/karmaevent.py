@@ -0,0 +1,17 @@
+import mongoengine
+import datetime
+
+class KarmaEvent(mongoengine.Document):
+    to_id   = mongoengine.IntField(required=True)
+    from_id = mongoengine.IntField(required=True)
+    amount  = mongoengine.IntField(required=True)
+    date    = mongoengine.DateTimeField(default=datetime.datetime.now, required=True)
+    reason  = mongoengine.StringField()
+    meta = {
+        'db_alias': 'default',
+        'collection': 'karma_events',
+        'indexes': [
+            ('to_id', '-date'),
+            ('from_id', '-date'),
+        ]
+    }
@@ -0,0 +1,15 @@
+import mongoengine
+
+class ModStats(mongoengine.Document):
+    _id     = mongoengine.IntField(required=True)
+    total   = mongoengine.IntField(required=True, default=0)
+    reasons = mongoengine.DictField(default={})
+    meta = {
+        'db_alias': 'default',
+        'collection': 'modstats'
+    }
+
+def reason_key(reason: str) -> str:
+    """The form of a case reason that mod stats are counted under, i.e "Spam!!" and "spam" are the same reason."""
+
+    return ''.join(e for e in reason.lower() if e.isalnum() or e == " ").strip()
@@ -0,0 +1,9 @@
+import mongoengine
+
+class SeenEntries(mongoengine.Document):
+    _id   = mongoengine.StringField(required=True)
+    guids = mongoengine.ListField(mongoengine.StringField(), default=[])
+    meta = {
+        'db_alias': 'default',
+        'collection': 'seen_entries'
+    }
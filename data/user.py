@@ -5,12 +5,16 @@ class User(mongoengine.Document):
     is_muted            = mongoengine.BooleanField(default=False, required=True)
     offline_report_ping = mongoengine.BooleanField(default=False, required=True)
     raid_verified       = mongoengine.BooleanField(default=False, required=True)
-    
-    karma                  = mongoengine.IntField(required=True, default=0)
-    karma_received_history = mongoengine.ListField(default=[])
-    karma_given_history    = mongoengine.ListField(default=[])
+    karma               = mongoengine.IntField(required=True, default=0)
+    # bumped with every change to karma, to tell which of two concurrent changes is newer
+    karma_version       = mongoengine.IntField(default=0)
     
     meta = {
         'db_alias': 'default',
-        'collection': 'users'
+        'collection': 'users',
+        # karma history used to be stored here, see migrate_karma.py
+        'strict': False,
+        'indexes': [
+            ('-karma', '-_id'),
+        ]
     }
\ No newline at end of file
@@ -2,16 +2,18 @@ import datetime
 import logging
 import os
 import re
-import string
+import time
 
 import discord
 import humanize
 import pytimeparse
 from discord.ext import commands
 from dotenv import find_dotenv, load_dotenv
-from fold_to_ascii import fold
 import cogs.utils.context as context
 import cogs.utils.logs as logger
+from cogs.utils.feed_fetcher import FeedFetcher
+from cogs.utils.invite_cache import InviteCache
+from cogs.utils.normalize import normalize_message
 from cogs.monitors.report import Report
 from data.case import Case
 
@@ -66,7 +68,14 @@ class Bot(commands.Bot):
         self.spoiler_filter = r'\|\|(.*?)\|\|'
         self.invite_filter = r'(?:https?://)?discord(?:(?:app)?\.com/invite|\.gg)\/{1,}[a-zA-Z0-9]+/?'
         self.spam_cooldown = commands.CooldownMapping.from_cooldown(2, 10.0, commands.BucketType.user)
+        self.invite_cache = InviteCache(self)
     
+    async def close(self):
+        # flush buffered database writes before the cogs are unloaded and the loop stops
+        await self.settings.close()
+        await self.feed_fetcher.close()
+        await super().close()
+
     async def on_message(self, message):
         if message.author.bot:
             return
@@ -102,33 +111,23 @@ class Bot(commands.Bot):
         """
         BAD WORD FILTER
         """
-        symbols = (u"абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ",
-                   u"abBrdeex3nnKnmHonpcTyoxu4wwbbbeoRABBrDEEX3NNKNMHONPCTyOXU4WWbbbEOR")
-
-        tr = {ord(a): ord(b) for a, b in zip(*symbols)}
-
-        folded_message = fold(message.content.translate(tr).lower()).lower()
-        folded_without_spaces = "".join(folded_message.split())
-        folded_without_spaces_and_punctuation = folded_without_spaces.translate(str.maketrans('', '', string.punctuation))
+        normalized = normalize_message(message)
         word_found = False
         
-        if folded_message:
+        if normalized.folded:
             reported = False
-            for word in guild.filter_words:
-                if not self.settings.permissions.hasAtLeast(message.guild, message.author, word.bypass):
-                    if (word.word.lower() in folded_message) or \
-                        (not word.false_positive and word.word.lower() in folded_without_spaces) or \
-                        (not word.false_positive and word.word.lower() in folded_without_spaces_and_punctuation):
-                        # remove all whitespace, punctuation in message and run filter again
-                        word_found = True
-                        await self.delete(message)
-                        if not reported:
-                            await self.do_filter_notify(message.author, message.channel, word.word)
-                            await self.ratelimit(message)
-                            reported = True
-                        if word.notify:
-                            await self.report.report(message, message.author, word.word)
-                            return True
+            # single pass over the message for all the filter words the author can't bypass
+            level = self.settings.permissions.level(message.guild, message.author)
+            for word in self.settings.word_filter().match(normalized, level):
+                word_found = True
+                await self.delete(message)
+                if not reported:
+                    await self.do_filter_notify(message.author, message.channel, word.word)
+                    await self.ratelimit(message)
+                    reported = True
+                if word.notify:
+                    await self.report.report(message, message.author, word.word)
+                    return True
         return word_found
     
     async def do_invite_filter(self, message):
@@ -140,26 +139,12 @@ class Bot(commands.Bot):
                 invites = re.findall(self.invite_filter, message.content, flags=re.S)
                 if invites:
                     whitelist = self.settings.guild().filter_excluded_guilds
-                    for invite in invites:
-                        try:
-                            invite = await self.fetch_invite(invite)
-
-                            id = None
-                            if isinstance(invite, discord.Invite):
-                                if invite.guild is not None:
-                                    id = invite.guild.id
-                                else:
-                                    id = 123
-                            elif isinstance(invite, discord.PartialInviteGuild) or isinstance(invite, discord.PartialInviteChannel):
-                                id = invite.id
-
-                            if id not in whitelist:
-                                await self.delete(message)
-                                await self.ratelimit(message)
-                                await self.report.report(message, message.author, invite, invite=invite)
-                                return True
-
-                        except discord.errors.NotFound:
+                    # look up all the (distinct) invites in the message concurrently, through the cache
+                    invites = list(dict.fromkeys(invites))
+                    guild_ids = await self.invite_cache.resolve_many(invites)
+                    for invite, id in zip(invites, guild_ids):
+                        # id is None if the invite doesn't exist
+                        if id is None or id not in whitelist:
                             await self.delete(message)
                             await self.ratelimit(message)
                             await self.report.report(message, message.author, invite, invite=invite)
@@ -199,7 +184,6 @@ class Bot(commands.Bot):
             return
 
         case = Case(
-            _id=self.settings.guild().case_id,
             _type="MUTE",
             date=now,
             mod_id=ctx.me.id,
@@ -218,11 +202,9 @@ class Bot(commands.Bot):
                 raise commands.BadArgument(
                     "An error occured, this user is probably already muted")
 
-        await self.settings.inc_caseid()
-        await self.settings.add_case(user.id, case)
+        await self.settings.create_case(user.id, case)
         u = await self.settings.user(id=user.id)
-        u.is_muted = True
-        u.save()
+        self.settings.update_user(u, is_muted=True)
 
         await user.add_roles(mute_role)
 
@@ -259,9 +241,19 @@ if __name__ == '__main__':
     bot.owner_id = int(os.environ.get("CHROMEY_OWNER"))
     bot.send_error = send_error
     bot.report = Report(bot)
+    bot.feed_fetcher = FeedFetcher(bot)
     bot.remove_command("help")
+    load_times = []
     for extension in initial_extensions:
+        start = time.perf_counter()
         bot.load_extension(extension)
+        load_times.append((extension, time.perf_counter() - start))
+
+    # report how long each extension took to load, slowest first
+    print("Loaded extensions:")
+    for extension, seconds in sorted(load_times, key=lambda t: t[1], reverse=True):
+        print(f"    {extension:<35} {seconds * 1000:8.1f}ms")
+    print(f"    {'total':<35} {sum(t for _, t in load_times) * 1000:8.1f}ms")
 
 
 @bot.event
@@ -0,0 +1,66 @@
+import os
+
+import mongoengine
+from dotenv import find_dotenv, load_dotenv
+from pymongo import UpdateOne
+
+from data.case import Case
+from data.modstats import ModStats, reason_key
+
+"""
+Moves cases from the old layout (one document per user in the `cases` collection, holding
+all of their cases in an embedded list) to the `case` collection, one document per case.
+Safe to run more than once, cases that were already migrated are left alone.
+The old collection isn't touched, drop it yourself once you've checked the result.
+
+Afterwards the per-moderator case counters used by !casestats are rebuilt from the cases,
+so run this while the bot is stopped.
+"""
+
+load_dotenv(find_dotenv())
+
+def migrate(batch_size=1000):
+    print("STARTING MIGRATION...")
+    old = Case._get_collection().database["cases"]
+    new = Case._get_collection()
+
+    migrated = 0
+    ops = []
+    for document in old.find():
+        for case in document.get("cases", []):
+            case["user_id"] = document["_id"]
+            ops.append(UpdateOne({"_id": case["_id"]}, {"$setOnInsert": case}, upsert=True))
+
+        if len(ops) >= batch_size:
+            migrated += new.bulk_write(ops, ordered=False).upserted_count
+            ops = []
+
+    if ops:
+        migrated += new.bulk_write(ops, ordered=False).upserted_count
+
+    Case.ensure_indexes()
+    print(f"Migrated {migrated} cases")
+    rebuild_mod_stats()
+    print("DONE")
+
+def rebuild_mod_stats():
+    # count cases per (mod, exact reason) in the database, then merge reasons
+    # that only differ in case/punctuation here
+    pipeline = [{"$group": {"_id": {"mod_id": "$mod_id", "reason": "$reason"}, "count": {"$sum": 1}}}]
+
+    stats = {}
+    for group in Case._get_collection().aggregate(pipeline):
+        mod = stats.setdefault(group["_id"]["mod_id"], {"_id": group["_id"]["mod_id"], "total": 0, "reasons": {}})
+        mod["total"] += group["count"]
+        key = reason_key(group["_id"]["reason"])
+        if key:
+            mod["reasons"][key] = mod["reasons"].get(key, 0) + group["count"]
+
+    ModStats._get_collection().delete_many({})
+    if stats:
+        ModStats._get_collection().insert_many(list(stats.values()))
+    print(f"Rebuilt case stats for {len(stats)} moderators")
+
+if __name__ == "__main__":
+        mongoengine.register_connection(alias="default", name="chromey", host=os.environ.get("CHROMEY_MONGO_HOST", "localhost"))
+        migrate()
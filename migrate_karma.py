@@ -0,0 +1,63 @@
+import calendar
+import hashlib
+import os
+
+import mongoengine
+from bson import ObjectId
+from dotenv import find_dotenv, load_dotenv
+from pymongo.errors import BulkWriteError
+
+from data.karmaevent import KarmaEvent
+from data.user import User
+
+"""
+Moves karma history out of the User documents (the `karma_received_history` and
+`karma_given_history` lists) into the `karma_events` collection, one document per event.
+Every give/take was recorded in both users' lists, so only the received side is copied.
+Users are migrated one at a time and their lists removed afterwards, so the script can
+be run again if it was interrupted. Every event gets an ID derived from the user, its
+position in the list and its date, so events copied by an interrupted run aren't
+copied a second time.
+"""
+
+load_dotenv(find_dotenv())
+
+def event_id(user_id: int, i: int, date) -> ObjectId:
+    # like a generated ObjectId, starts with the timestamp (of the event)
+    timestamp = calendar.timegm(date.utctimetuple()).to_bytes(4, "big")
+    return ObjectId(timestamp + hashlib.sha1(f"{user_id}:{i}".encode()).digest()[:8])
+
+def migrate():
+    print("STARTING MIGRATION...")
+    users = User._get_collection()
+    events = KarmaEvent._get_collection()
+
+    migrated = 0
+    query = {"$or": [{"karma_received_history": {"$exists": True}}, {"karma_given_history": {"$exists": True}}]}
+    for user in users.find(query, {"karma_received_history": True}):
+        history = [{
+            "_id": event_id(user["_id"], i, action["date"]),
+            "to_id": user["_id"],
+            "from_id": action["from"],
+            "amount": action["amount"],
+            "date": action["date"],
+            "reason": action.get("reason"),
+        } for i, action in enumerate(user.get("karma_received_history", []))]
+
+        if history:
+            try:
+                events.insert_many(history, ordered=False)
+                migrated += len(history)
+            except BulkWriteError as e:
+                # events that already exist were copied by an earlier, interrupted run
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+                migrated += e.details["nInserted"]
+        users.update_one({"_id": user["_id"]}, {"$unset": {"karma_received_history": "", "karma_given_history": ""}})
+
+    KarmaEvent.ensure_indexes()
+    print(f"DONE, migrated {migrated} karma events")
+
+if __name__ == "__main__":
+        mongoengine.register_connection(alias="default", name="chromey", host=os.environ.get("CHROMEY_MONGO_HOST", "localhost"))
+        migrate()